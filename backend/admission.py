@@ -0,0 +1,200 @@
+"""Admission control for streaming sessions
+
+Past saturation every extra WebSocket session makes all sessions slower
+together. A session costs its model's real-time factor times the audio it
+gets decoded per second of wall time: more than one second with streaming
+re-decodes, less when VAD skips silence. The controller measures both,
+adds up the demand of the connected sessions on each device and admits a
+new session only if it still fits in ``ADMISSION_TARGET_UTILIZATION`` of
+that device's inference workers. Otherwise the session waits up to
+``ADMISSION_QUEUE_S`` for a slot and is then turned away with a retry-after
+hint.
+
+Sessions for a model that has not been measured yet are admitted (up to
+``ADMISSION_MAX_STREAMS``, if set).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from metrics import ADMISSION_DECISIONS_TOTAL
+from src.env import env_flag
+from whisper_service import MEASURED_SPEED, ModelKey, whisper_service
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = env_flag("ADMISSION_ENABLED", True)
+# Share of the inference workers that admitted sessions may use
+ADMISSION_TARGET_UTILIZATION = float(os.getenv("ADMISSION_TARGET_UTILIZATION", "0.9"))
+# Hard limit on sessions per server (0 = capacity estimate only)
+ADMISSION_MAX_STREAMS = int(os.getenv("ADMISSION_MAX_STREAMS", "0"))
+# How long a session over capacity waits for a slot before it is rejected
+ADMISSION_QUEUE_S = float(os.getenv("ADMISSION_QUEUE_S", "10"))
+ADMISSION_RETRY_AFTER_S = int(os.getenv("ADMISSION_RETRY_AFTER_S", "5"))
+# Window over which real-time factor and decoded audio per session are measured
+ADMISSION_SAMPLE_S = float(os.getenv("ADMISSION_SAMPLE_S", "5"))
+
+QUEUE_POLL_S = 0.5
+SMOOTHING = 0.3
+
+
+class AdmissionController:
+    """Estimates remaining session capacity per device and admits or queues sessions"""
+
+    def __init__(self, streams: Callable[[], Dict[Optional[ModelKey], int]],
+                 enabled: bool = ADMISSION_ENABLED,
+                 target_utilization: float = ADMISSION_TARGET_UTILIZATION,
+                 max_streams: int = ADMISSION_MAX_STREAMS,
+                 queue_s: float = ADMISSION_QUEUE_S,
+                 retry_after_s: int = ADMISSION_RETRY_AFTER_S):
+        # Connected sessions per model key, supplied by the connection manager
+        self._streams = streams
+        self.enabled = enabled
+        self.target_utilization = target_utilization
+        self.max_streams = max_streams
+        self.queue_s = queue_s
+        self.retry_after_s = retry_after_s
+        # Smoothed real-time factor per model key over recent windows
+        self._rtf: Dict[ModelKey, float] = {}
+        # Seconds of audio decoded per wall-clock second per session
+        self.decode_ratio: Optional[float] = None
+        self._totals: Dict[ModelKey, Tuple[float, float]] = MEASURED_SPEED.totals()
+        self._sampled_at = time.monotonic()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def _sample(self):
+        """Fold the inference work done since the last window into the estimates"""
+        now = time.monotonic()
+        interval = now - self._sampled_at
+        if interval < ADMISSION_SAMPLE_S:
+            return
+        totals = MEASURED_SPEED.totals()
+        decoded = 0.0
+        for key, (audio_seconds, elapsed) in totals.items():
+            previous_audio, previous_elapsed = self._totals.get(key, (0.0, 0.0))
+            audio_delta = audio_seconds - previous_audio
+            if audio_delta <= 0:
+                continue
+            rtf = (elapsed - previous_elapsed) / audio_delta
+            current = self._rtf.get(key)
+            self._rtf[key] = rtf if current is None else current + SMOOTHING * (rtf - current)
+            decoded += audio_delta
+
+        streams = sum(self._streams().values())
+        if streams and decoded > 0:
+            ratio = decoded / interval / streams
+            self.decode_ratio = (ratio if self.decode_ratio is None
+                                 else self.decode_ratio + SMOOTHING * (ratio - self.decode_ratio))
+        self._totals = totals
+        self._sampled_at = now
+
+    def stream_load(self, key: ModelKey) -> Optional[float]:
+        """Inference worker-seconds one session of ``key`` needs per second (None = unmeasured)"""
+        rtf = self._rtf.get(key)
+        if rtf is None:
+            return None
+        return rtf * (self.decode_ratio if self.decode_ratio is not None else 1.0)
+
+    def _device_load(self, device: str, counts: Dict[Optional[ModelKey], int]) -> Tuple[float, float]:
+        """(demand of connected sessions, usable worker capacity) for one device"""
+        demand = sum(
+            count * (self.stream_load(key) or 0.0)
+            for key, count in counts.items() if key is not None and key.device == device
+        )
+        capacity = whisper_service.inference_workers(device) * self.target_utilization
+        return demand, capacity
+
+    def has_capacity(self, key: Optional[ModelKey]) -> bool:
+        """Whether one more session using ``key`` fits"""
+        if not self.enabled:
+            return True
+        self._sample()
+        counts = self._streams()
+        if self.max_streams and sum(counts.values()) >= self.max_streams:
+            return False
+        if key is None:
+            return True
+        load = self.stream_load(key)
+        if load is None:
+            return True
+        demand, capacity = self._device_load(key.device, counts)
+        return demand + load <= capacity
+
+    async def admit(self, key: Callable[[], Optional[ModelKey]],
+                    on_queued: Callable[[], Awaitable]) -> bool:
+        """Wait up to ``queue_s`` for capacity; False means reject with ``retry_after_s``
+
+        Returns without awaiting once capacity is found, so the caller can
+        register the session before any other waiter is re-checked.
+        """
+        deadline = time.monotonic() + self.queue_s
+        waiting = False
+        while True:
+            if self.has_capacity(key()):
+                self.admitted += 1
+                ADMISSION_DECISIONS_TOTAL.labels(result="admitted").inc()
+                return True
+            now = time.monotonic()
+            if now >= deadline:
+                self.rejected += 1
+                ADMISSION_DECISIONS_TOTAL.labels(result="rejected").inc()
+                logger.warning(f"Session rejected: over capacity ({sum(self._streams().values())} streams)")
+                return False
+            if not waiting:
+                waiting = True
+                self.queued += 1
+                ADMISSION_DECISIONS_TOTAL.labels(result="queued").inc()
+                await on_queued()
+            await asyncio.sleep(min(QUEUE_POLL_S, deadline - now))
+
+    def remaining_streams(self, key: Optional[ModelKey]) -> Optional[int]:
+        """Estimated number of additional sessions of ``key`` (None = not measured yet)"""
+        if not self.enabled or key is None:
+            return None
+        self._sample()
+        counts = self._streams()
+        remaining = None
+        load = self.stream_load(key)
+        if load:
+            demand, capacity = self._device_load(key.device, counts)
+            remaining = max(0, int((capacity - demand) / load))
+        if self.max_streams:
+            left = max(0, self.max_streams - sum(counts.values()))
+            remaining = left if remaining is None else min(remaining, left)
+        return remaining
+
+    def get_stats(self) -> dict:
+        counts = self._streams()
+        default_key = whisper_service.default_key
+        devices = {}
+        for device in {key.device for key in counts if key is not None}:
+            demand, _ = self._device_load(device, counts)
+            workers = whisper_service.inference_workers(device)
+            devices[device] = {
+                "streams": sum(n for k, n in counts.items() if k is not None and k.device == device),
+                "workers": workers,
+                "demand": round(demand, 3),
+                "utilization": round(demand / workers, 3),
+            }
+        return {
+            "enabled": self.enabled,
+            "streams": sum(counts.values()),
+            "remaining_streams": self.remaining_streams(default_key),
+            "accepting": self.has_capacity(default_key),
+            "retry_after_s": self.retry_after_s,
+            "decode_ratio": round(self.decode_ratio, 3) if self.decode_ratio is not None else None,
+            "realtime_factor": [
+                {**key._asdict(), "rtf": round(rtf, 4)} for key, rtf in self._rtf.items()
+            ],
+            "devices": devices,
+            "target_utilization": self.target_utilization,
+            "max_streams": self.max_streams or None,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
@@ -6,32 +6,226 @@ import logging
 from pydub import AudioSegment
 import asyncio
 import base64
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from protocol import AudioFrame, to_float32
+from stream_decoder import DEMUXERS, StreamDecoder
+from resampler import PolyphaseResampler, downmix
+from src.env import env_flag
+from src.vad import StreamingVAD
+from metrics import AUDIO_DECODE_SECONDS, BUFFER_WAIT_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# Maximum audio held per session before the oldest samples are overwritten
+DEFAULT_BUFFER_SECONDS = float(os.getenv("AUDIO_BUFFER_SECONDS", "30"))
+
+# Streaming VAD in front of the model
+VAD_ENABLED = env_flag("VAD_ENABLED", True)
+VAD_MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "500"))
+VAD_MAX_SEGMENT_MS = int(os.getenv("VAD_MAX_SEGMENT_MS", "10000"))
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "12"))
+
+# Decode compressed formats with one long-lived ffmpeg per recording instead of one per chunk
+STREAM_DECODER_ENABLED = env_flag("AUDIO_STREAM_DECODER", True)
+
+# Client PCM rates and channel counts resampled in-process. Only standard rates:
+# an arbitrary rate ratio can need a filter bank of many megabytes
+INPUT_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000, 88200, 96000, 176400, 192000)
+MAX_INPUT_CHANNELS = 8
+# Binary stream ids per session (each may hold resampler state)
+MAX_INPUT_STREAMS = 4
+
+
+class AudioRingBuffer:
+    """Fixed-capacity float32 ring buffer with zero-copy reads
+
+    Every sample is written twice (at ``i`` and ``i + capacity``) so that any
+    window of up to ``capacity`` samples is a contiguous slice of the backing
+    array. Reads are therefore plain numpy views, never copies.
+    """
+    
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("Ring buffer capacity must be positive")
+        self.capacity = capacity
+        self._data = np.zeros(capacity * 2, dtype=np.float32)
+        self._start = 0
+        self._size = 0
+        self.overflow_samples = 0
+        self.overflow_events = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def write(self, samples: np.ndarray) -> int:
+        """Append samples, overwriting the oldest on overflow. Returns samples dropped."""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        n = len(samples)
+        if n == 0:
+            return 0
+        
+        dropped = 0
+        # A single write larger than the buffer keeps only its newest samples
+        if n > self.capacity:
+            dropped += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        
+        # Make room by discarding the oldest samples
+        excess = self._size + n - self.capacity
+        if excess > 0:
+            self.consume(excess)
+            dropped += excess
+        
+        end = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - end)
+        self._data[end:end + first] = samples[:first]
+        self._data[end + self.capacity:end + self.capacity + first] = samples[:first]
+        rest = n - first
+        if rest:
+            self._data[:rest] = samples[first:]
+            self._data[self.capacity:self.capacity + rest] = samples[first:]
+        self._size += n
+        
+        if dropped:
+            self.overflow_samples += dropped
+            self.overflow_events += 1
+        return dropped
+    
+    def view(self, n: Optional[int] = None) -> np.ndarray:
+        """Zero-copy view of the oldest ``n`` samples (all buffered samples by default)
+
+        The view is only valid until the next ``write``; copy it if it must outlive that.
+        """
+        n = self._size if n is None else min(n, self._size)
+        return self._data[self._start:self._start + n]
+    
+    def consume(self, n: int):
+        """Drop the oldest ``n`` samples"""
+        n = min(n, self._size)
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+        if self._size == 0:
+            self._start = 0
+    
+    def clear(self):
+        """Drop all buffered samples (overflow counters are kept)"""
+        self._start = 0
+        self._size = 0
+
+
 class AudioProcessor:
     """Process audio data from WebSocket"""
     
-    def __init__(self, sample_rate: int = 16000):
+    def __init__(self, sample_rate: int = 16000, buffer_seconds: float = DEFAULT_BUFFER_SECONDS,
+                 vad_enabled: bool = VAD_ENABLED):
         self.sample_rate = sample_rate
-        self.audio_buffer = []
         self.chunk_duration_ms = 5000  # 5 seconds chunks
+        capacity = int(sample_rate * max(buffer_seconds, self.chunk_duration_ms / 1000))
+        self.audio_buffer = AudioRingBuffer(capacity)
+        self.last_sequence = {}
+        self.sequence_gaps = 0
+        # Arrival time of the oldest audio not yet sent for inference
+        self.pending_since: Optional[float] = None
+        self.vad = StreamingVAD(
+            sample_rate=sample_rate,
+            threshold_db=VAD_THRESHOLD_DB,
+            min_silence_ms=VAD_MIN_SILENCE_MS,
+            max_segment_ms=VAD_MAX_SEGMENT_MS
+        ) if vad_enabled else None
+        self.decoder: Optional[StreamDecoder] = None
+        # Resampler state per client stream (binary stream id, or "pcm" for JSON audio)
+        self.resamplers = {}
+    
+    @staticmethod
+    def _to_bytes(audio_data) -> bytes:
+        """Decode base64 (optionally a data URL) to raw bytes"""
+        if isinstance(audio_data, str):
+            # Remove data URL prefix if present
+            if audio_data.startswith('data:audio'):
+                audio_data = audio_data.split(',')[1]
+            audio_data = base64.b64decode(audio_data)
+        return audio_data
+    
+    def uses_stream_decoder(self, format: str) -> bool:
+        """Whether chunks in this format go through the persistent decoder"""
+        return STREAM_DECODER_ENABLED and format in DEMUXERS
+    
+    async def feed_stream(self, audio_data, format: str, on_audio: Callable[[np.ndarray], Awaitable]):
+        """Pass a compressed chunk to the session's decoder, starting one if needed
+
+        Decoded audio is delivered to ``on_audio`` as ffmpeg produces it, so
+        it may arrive after this call returns.
+        """
+        started = time.perf_counter()
+        data = self._to_bytes(audio_data)
+        if self.decoder is not None and (self.decoder.format != format or not self.decoder.running):
+            await self.finish_stream()
+        if self.decoder is None:
+            self.decoder = StreamDecoder(format, self.sample_rate, on_audio)
+            await self.decoder.start()
+        try:
+            await self.decoder.feed(data)
+        except Exception:
+            # Start over with the next chunk (a new recording sends a fresh header)
+            self.decoder.kill()
+            self.decoder = None
+            raise
+        AUDIO_DECODE_SECONDS.labels(format=format).observe(time.perf_counter() - started)
+    
+    async def finish_stream(self):
+        """End the current compressed stream and deliver its remaining audio"""
+        decoder, self.decoder = self.decoder, None
+        if decoder is not None:
+            await decoder.finish()
+    
+    def close(self):
+        """Release the decoder process when the session ends"""
+        if self.decoder is not None:
+            self.decoder.kill()
+            self.decoder = None
         
-    async def process_audio_chunk(self, audio_data: bytes, format: str = "webm") -> np.ndarray:
-        """Convert audio chunk to numpy array for Whisper"""
+    async def to_model_rate(self, stream, samples: np.ndarray, sample_rate: int, channels: int = 1) -> np.ndarray:
+        """Mix interleaved PCM down to mono and resample it to the model rate
+
+        Each stream keeps its own resampler so filter state carries across chunks.
+        """
+        if sample_rate not in INPUT_RATES:
+            raise ValueError(f"Unsupported sample rate {sample_rate} Hz (supported: {', '.join(map(str, INPUT_RATES))})")
+        if not 1 <= channels <= MAX_INPUT_CHANNELS:
+            raise ValueError(f"Unsupported channel count {channels}")
+        
+        samples = downmix(samples, channels)
+        if sample_rate == self.sample_rate:
+            return samples
+        resampler = self.resamplers.get(stream)
+        if resampler is None or resampler.input_rate != sample_rate:
+            # Designing a new filter bank takes a few milliseconds; keep it off the event loop
+            resampler = await asyncio.to_thread(PolyphaseResampler, sample_rate, self.sample_rate)
+            self.resamplers[stream] = resampler
+        return resampler.process(samples)
+    
+    async def process_audio_chunk(self, audio_data: bytes, format: str = "webm",
+                                  sample_rate: Optional[int] = None, channels: int = 1) -> np.ndarray:
+        """Convert a self-contained audio chunk to a numpy array for Whisper
+
+        PCM chunks are interleaved float32 at ``sample_rate`` (the model rate if
+        not given) with ``channels`` channels.
+        """
+        started = time.perf_counter()
         try:
-            # If data is base64 encoded
-            if isinstance(audio_data, str):
-                # Remove data URL prefix if present
-                if audio_data.startswith('data:audio'):
-                    audio_data = audio_data.split(',')[1]
-                audio_data = base64.b64decode(audio_data)
+            audio_data = self._to_bytes(audio_data)
             
             # Handle PCM format (raw float32 data)
             if format == "pcm":
                 # Convert bytes directly to float32 numpy array
                 # The data is already normalized [-1, 1] from the frontend
                 samples = np.frombuffer(audio_data, dtype=np.float32)
+                samples = await self.to_model_rate("pcm", samples, sample_rate or self.sample_rate, channels)
+                AUDIO_DECODE_SECONDS.labels(format=format).observe(time.perf_counter() - started)
                 return samples
             
             # Handle other formats (webm, etc.) using pydub
@@ -58,30 +252,99 @@ class AudioProcessor:
             else:
                 samples = samples.astype(np.float32)
             
+            AUDIO_DECODE_SECONDS.labels(format=format).observe(time.perf_counter() - started)
             return samples
             
         except Exception as e:
             logger.error(f"Audio processing error: {e}")
             raise
     
-    def add_to_buffer(self, audio_array: np.ndarray):
-        """Add audio to buffer"""
-        self.audio_buffer.extend(audio_array.tolist())
+    async def process_binary_frame(self, frame: AudioFrame) -> np.ndarray:
+        """Convert a protocol v2 binary frame to mono float32 at the target rate"""
+        started = time.perf_counter()
+        
+        if frame.stream_id not in self.last_sequence and len(self.last_sequence) >= MAX_INPUT_STREAMS:
+            raise ValueError(f"Too many audio streams (at most {MAX_INPUT_STREAMS} per session)")
+        
+        # Track dropped or reordered frames per stream
+        previous = self.last_sequence.get(frame.stream_id)
+        if previous is not None and frame.sequence != previous + 1:
+            self.sequence_gaps += 1
+            logger.warning(
+                f"Stream {frame.stream_id}: sequence jumped from {previous} to {frame.sequence}"
+            )
+        self.last_sequence[frame.stream_id] = frame.sequence
+        
+        samples = await self.to_model_rate(frame.stream_id, to_float32(frame), frame.sample_rate, frame.channels)
+        AUDIO_DECODE_SECONDS.labels(format="binary").observe(time.perf_counter() - started)
+        return samples
+    
+    def split_speech(self, audio_array: np.ndarray) -> list:
+        """Run the session VAD over a chunk
+
+        Returns ``(audio, ends_utterance)`` pieces containing only speech. Without
+        VAD the chunk is passed through unchanged and never ends an utterance.
+        """
+        if self.vad is None:
+            return [(audio_array, False)]
+        return self.vad.process(audio_array)
+    
+    def add_to_buffer(self, audio_array: np.ndarray) -> int:
+        """Add audio to buffer. Returns the number of samples dropped on overflow."""
+        if self.pending_since is None and len(audio_array):
+            self.pending_since = time.monotonic()
+        dropped = self.audio_buffer.write(audio_array)
+        if dropped:
+            logger.warning(
+                f"Audio buffer overflow: dropped {dropped} samples "
+                f"({self.audio_buffer.overflow_events} overflows so far)"
+            )
+        return dropped
     
     def get_buffer_duration_ms(self) -> float:
         """Get current buffer duration in milliseconds"""
         return (len(self.audio_buffer) / self.sample_rate) * 1000
     
-    def should_process_buffer(self) -> bool:
-        """Check if buffer has enough audio to process"""
-        return self.get_buffer_duration_ms() >= self.chunk_duration_ms
+    def should_process_buffer(self, chunk_scale: float = 1.0) -> bool:
+        """Check if buffer has enough audio to process (``chunk_scale`` lengthens the chunk)"""
+        chunk_ms = min(self.chunk_duration_ms * chunk_scale, self.audio_buffer.capacity / self.sample_rate * 1000)
+        return self.get_buffer_duration_ms() >= chunk_ms
+    
+    def mark_dispatched(self):
+        """Record how long the pending audio waited before being sent for inference"""
+        if self.pending_since is not None:
+            BUFFER_WAIT_SECONDS.labels().observe(time.monotonic() - self.pending_since)
+            self.pending_since = None
+    
+    def get_buffer_view(self) -> np.ndarray:
+        """Zero-copy view of the buffered audio (valid until the next add_to_buffer)"""
+        return self.audio_buffer.view()
     
     def get_and_clear_buffer(self) -> np.ndarray:
-        """Get buffer contents and clear it"""
-        audio_data = np.array(self.audio_buffer, dtype=np.float32)
-        self.audio_buffer = []
+        """Get buffer contents and clear it
+
+        Returns a zero-copy view, valid until the next add_to_buffer. The
+        session's inference task is the only writer and awaits each decode, so
+        the view is never overwritten while it is being transcribed.
+        """
+        audio_data = self.audio_buffer.view()
+        self.audio_buffer.clear()
+        self.mark_dispatched()
         return audio_data
     
     def clear_buffer(self):
         """Clear the audio buffer"""
-        self.audio_buffer = []
\ No newline at end of file
+        self.audio_buffer.clear()
+        self.pending_since = None
+    
+    def get_buffer_stats(self) -> dict:
+        """Buffer fill level and overflow counters"""
+        return {
+            "buffered_ms": self.get_buffer_duration_ms(),
+            "capacity_ms": (self.audio_buffer.capacity / self.sample_rate) * 1000,
+            "overflow_samples": self.audio_buffer.overflow_samples,
+            "overflow_events": self.audio_buffer.overflow_events,
+            "sequence_gaps": self.sequence_gaps,
+            "decoder": self.decoder.get_stats() if self.decoder else None,
+            "vad": self.vad.get_stats() if self.vad else None,
+        }
\ No newline at end of file
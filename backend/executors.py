@@ -0,0 +1,100 @@
+"""Dedicated thread pools for inference and model loading
+
+asyncio's default executor is shared by everything in the process and is not
+sized for the device. Inference gets its own pool per device, sized by
+configuration, and model loads run in a separate pool so a multi-second load
+can never occupy the workers live transcription needs.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from metrics import EXECUTOR_RUN_SECONDS, EXECUTOR_WAIT_SECONDS
+
+# Inference worker threads per device (GPU work serializes on the device anyway)
+INFERENCE_WORKERS = {
+    "cuda": int(os.getenv("INFERENCE_WORKERS_CUDA", "1")),
+    "cpu": int(os.getenv("INFERENCE_WORKERS_CPU", str(max(1, (os.cpu_count() or 2) // 4)))),
+}
+MODEL_LOAD_WORKERS = int(os.getenv("MODEL_LOAD_WORKERS", "1"))
+
+
+class InstrumentedExecutor:
+    """Thread pool that tracks active/queued tasks and queue wait time"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.wait_time_histogram = EXECUTOR_WAIT_SECONDS.labels(executor=name)
+        self.run_time_histogram = EXECUTOR_RUN_SECONDS.labels(executor=name)
+
+    def _wrap(self, fn: Callable, args: tuple, submitted: float):
+        def run():
+            started = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+            self.wait_time_histogram.observe(started - submitted)
+            try:
+                return fn(*args)
+            finally:
+                self.run_time_histogram.observe(time.monotonic() - started)
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+        return run
+
+    async def run(self, fn: Callable, *args):
+        """Run ``fn(*args)`` on the pool and await its result"""
+        with self._lock:
+            self.queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, self._wrap(fn, args, time.monotonic()))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "active": self.active,
+            "queued": self.queued,
+            "completed": self.completed,
+            "wait_time_seconds": self.wait_time_histogram.snapshot(),
+            "run_time_seconds": self.run_time_histogram.snapshot(),
+        }
+
+
+class ExecutorRegistry:
+    """One inference pool per device plus a shared model-loading pool"""
+
+    def __init__(self):
+        self._inference = {}
+        self.loading = InstrumentedExecutor("model-load", MODEL_LOAD_WORKERS)
+
+    def inference(self, device: str) -> InstrumentedExecutor:
+        executor = self._inference.get(device)
+        if executor is None:
+            executor = InstrumentedExecutor(f"inference-{device}", INFERENCE_WORKERS.get(device, 1))
+            self._inference[device] = executor
+        return executor
+
+    def shutdown(self):
+        for executor in self._inference.values():
+            executor.shutdown()
+        self.loading.shutdown()
+
+    def get_stats(self) -> dict:
+        return {
+            "inference": {device: e.get_stats() for device, e in self._inference.items()},
+            "model_loading": self.loading.get_stats(),
+        }
@@ -0,0 +1,126 @@
+"""Deterministic stand-in for WhisperModel used for load testing
+
+Set ``WHISPER_FAKE_MODEL=true`` to serve every model size with this class. It
+needs no model download or GPU. Each call sleeps for
+``WHISPER_FAKE_LATENCY_MS + WHISPER_FAKE_RTF * audio_seconds`` in the calling
+worker thread, so executor, batching and queueing behave as they would with a
+real model. The transcript is derived from the audio content, so identical
+audio always gives identical text. ``FakeBatchedPipeline`` stands in for
+``BatchedInferencePipeline``, so cross-session batches go through the same
+clip-building code as with a real model.
+"""
+
+import os
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from src.env import env_flag
+
+FAKE_MODEL = env_flag("WHISPER_FAKE_MODEL", False)
+FAKE_LATENCY_MS = float(os.getenv("WHISPER_FAKE_LATENCY_MS", "50"))
+FAKE_RTF = float(os.getenv("WHISPER_FAKE_RTF", "0.1"))
+
+SAMPLE_RATE = 16000
+WORD_SECONDS = 0.4
+VOCABULARY = (
+    "the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog",
+    "hello", "world", "speech", "to", "text", "is", "working", "today",
+)
+
+
+class FakeWord(NamedTuple):
+    start: float
+    end: float
+    word: str
+    probability: float = 1.0
+
+
+class FakeSegment(NamedTuple):
+    start: float
+    end: float
+    text: str
+    words: Optional[List[FakeWord]]
+
+
+class FakeInfo(NamedTuple):
+    language: str
+    language_probability: float
+    duration: float
+
+
+class FakeWhisperModel:
+    """Mimics ``WhisperModel.transcribe`` with configurable latency"""
+
+    def __init__(self, model_size: str, latency_ms: float = FAKE_LATENCY_MS, rtf: float = FAKE_RTF, **kwargs):
+        self.model_size = model_size
+        self.latency = latency_ms / 1000
+        self.rtf = rtf
+
+    def transcribe(self, audio: np.ndarray, language: str = "en", word_timestamps: bool = False, **kwargs):
+        duration = len(audio) / SAMPLE_RATE
+        time.sleep(self.latency)
+        return self._decode(self.segments(audio, word_timestamps), duration), FakeInfo(language, 1.0, duration)
+
+    def segments(self, audio: np.ndarray, word_timestamps: bool, offset: float = 0.0) -> List[FakeSegment]:
+        """The transcript of ``audio``, with times shifted by ``offset`` seconds"""
+        # One word per non-silent span; the word is picked from the span's energy
+        words = []
+        span = int(WORD_SECONDS * SAMPLE_RATE)
+        for start in range(0, len(audio) - span + 1, span):
+            rms = float(np.sqrt(np.mean(np.square(audio[start:start + span], dtype=np.float64))))
+            if rms < 0.01:
+                continue
+            word = VOCABULARY[int(rms * 1000) % len(VOCABULARY)]
+            words.append(FakeWord(offset + start / SAMPLE_RATE, offset + (start + span) / SAMPLE_RATE, f" {word}"))
+
+        segments = []
+        # Group words into segments of up to 8 words, like short Whisper segments
+        for i in range(0, len(words), 8):
+            group = words[i:i + 8]
+            segments.append(FakeSegment(
+                start=group[0].start,
+                end=group[-1].end,
+                text="".join(w.word for w in group),
+                words=group if word_timestamps else None
+            ))
+        return segments
+
+    def _decode(self, segments: List[FakeSegment], duration: float):
+        """Spend the decode time lazily, segment by segment, like faster-whisper's generator"""
+        decoded = 0.0
+        for segment in segments:
+            time.sleep(self.rtf * (segment.end - decoded))
+            decoded = segment.end
+            yield segment
+        time.sleep(self.rtf * max(0.0, duration - decoded))
+
+
+class FakeBatchedPipeline:
+    """Mimics ``BatchedInferencePipeline.transcribe`` with explicit clip timestamps
+
+    As in faster-whisper, clips are sliced out of the audio by sample index.
+    Each batch of ``batch_size`` clips costs one call latency plus the decode
+    time of its longest clip.
+    """
+
+    def __init__(self, model: FakeWhisperModel):
+        self.model = model
+
+    def transcribe(self, audio: np.ndarray, language: str = "en", vad_filter: bool = True,
+                   clip_timestamps: Optional[List[dict]] = None, word_timestamps: bool = False,
+                   batch_size: int = 8, **kwargs):
+        if vad_filter or not clip_timestamps:
+            raise ValueError("FakeBatchedPipeline needs clip_timestamps with vad_filter=False")
+        # Sliced up front, like faster-whisper's collect_chunks
+        chunks = [audio[clip["start"]:clip["end"]] for clip in clip_timestamps]
+        duration = len(audio) / SAMPLE_RATE
+        return self._decode(chunks, clip_timestamps, word_timestamps, batch_size), FakeInfo(language, 1.0, duration)
+
+    def _decode(self, chunks: List[np.ndarray], clips: List[dict], word_timestamps: bool, batch_size: int):
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i:i + batch_size]
+            time.sleep(self.model.latency + self.model.rtf * max(len(c) for c in batch) / SAMPLE_RATE)
+            for chunk, clip in zip(batch, clips[i:i + batch_size]):
+                yield from self.model.segments(chunk, word_timestamps, clip["start"] / SAMPLE_RATE)
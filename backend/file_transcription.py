@@ -0,0 +1,209 @@
+"""Whole-file transcription for the HTTP /transcribe endpoint
+
+An upload is decoded by ffmpeg, cut into pieces of at most
+``FILE_MAX_PIECE_S`` seconds at VAD silence boundaries, and every piece is
+submitted to the whisper service right away. The pieces are decoded
+concurrently: the batch scheduler packs them into batched calls across the
+inference workers. Results are still emitted strictly in order, shifted back
+to file time, as soon as every earlier piece has finished.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, List, Optional, Tuple
+
+import numpy as np
+from starlette.datastructures import UploadFile
+
+from stream_decoder import StreamDecoder
+from whisper_service import ModelKey, whisper_service
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Longest piece sent to the model (Whisper's window is 30 s)
+FILE_MAX_PIECE_S = float(os.getenv("FILE_MAX_PIECE_S", "30"))
+# Decoded audio examined per VAD pass; only the last (possibly cut) region carries over
+FILE_VAD_WINDOW_S = float(os.getenv("FILE_VAD_WINDOW_S", "120"))
+# Pieces in flight per request; bounds memory and leaves room for live sessions
+FILE_MAX_PARALLEL = int(os.getenv("FILE_MAX_PARALLEL", "16"))
+UPLOAD_READ_SIZE = 1 << 16
+# Raw request bodies stay in memory up to this size, then spill to disk (as multipart files do)
+UPLOAD_SPOOL_MAX_MEMORY = 1 << 20
+
+
+class VadSplitter:
+    """Cuts a growing stream of audio into speech pieces at silences"""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, max_piece_s: float = FILE_MAX_PIECE_S,
+                 window_s: float = FILE_VAD_WINDOW_S):
+        # Imported here: faster-whisper is loaded by the service's startup task
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        self._speech_timestamps = get_speech_timestamps
+        self.sample_rate = sample_rate
+        self.max_piece = int(max_piece_s * sample_rate)
+        self.window = int(max(window_s, 2 * max_piece_s) * sample_rate)
+        self.vad_options = VadOptions(min_silence_duration_ms=500, max_speech_duration_s=max_piece_s)
+        self._pending: List[np.ndarray] = []
+        self._pending_samples = 0
+        # Stream position (in samples) of the first pending sample
+        self._offset = 0
+
+    def add(self, samples: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        """Buffer decoded audio; returns ``(start_sample, audio)`` pieces that are complete"""
+        self._pending.append(samples)
+        self._pending_samples += len(samples)
+        if self._pending_samples < self.window:
+            return []
+        return self._split(final=False)
+
+    def finish(self) -> List[Tuple[int, np.ndarray]]:
+        """Split everything that is left at end of stream"""
+        return self._split(final=True)
+
+    def _split(self, final: bool) -> List[Tuple[int, np.ndarray]]:
+        if not self._pending_samples:
+            return []
+        audio = np.concatenate(self._pending)
+        regions = self._speech_timestamps(audio, self.vad_options)
+
+        if final:
+            cut = len(audio)
+        elif regions:
+            # The last region may continue past the window; keep it for the next pass
+            cut = regions.pop()["start"]
+        else:
+            # No speech at all: keep a little in case speech starts right at the edge
+            cut = len(audio) - self.sample_rate
+
+        pieces = []
+        index = 0
+        while index < len(regions):
+            start, end = regions[index]["start"], regions[index]["end"]
+            index += 1
+            # Merge neighbouring regions while the piece fits the model window
+            while index < len(regions) and regions[index]["end"] - start <= self.max_piece:
+                end = regions[index]["end"]
+                index += 1
+            pieces.append((self._offset + start, audio[start:end]))
+
+        remainder = audio[cut:]
+        self._pending = [remainder] if len(remainder) else []
+        self._pending_samples = len(remainder)
+        self._offset += cut
+        return pieces
+
+
+async def spool_body(stream: AsyncIterator[bytes]) -> UploadFile:
+    """Read a raw request body into a temporary file
+
+    The body has to be read before the streaming response starts: from then
+    on Starlette takes the remaining request messages while it listens for a
+    client disconnect, and the decoder would never see them.
+    """
+    upload = UploadFile(SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY))
+    try:
+        async for data in stream:
+            if data:
+                await upload.write(data)
+        await upload.seek(0)
+    except BaseException:
+        await upload.close()
+        raise
+    return upload
+
+
+async def _read_upload(upload: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        data = await upload.read(UPLOAD_READ_SIZE)
+        if not data:
+            return
+        yield data
+
+
+async def transcribe_upload(upload: UploadFile, language: str = "en", model: Optional[ModelKey] = None,
+                            word_timestamps: bool = False) -> AsyncIterator[dict]:
+    """Decode, split and transcribe an upload, yielding results in file order
+
+    Yields transcription messages with file-relative timestamps, then a
+    ``done`` summary (or an ``error`` message if the upload cannot be decoded).
+    """
+    started = time.monotonic()
+    splitter = VadSplitter()
+    slots = asyncio.Semaphore(max(1, FILE_MAX_PARALLEL))
+    # Piece tasks in file order; None marks the end of the upload
+    ordered: asyncio.Queue = asyncio.Queue()
+
+    async def transcribe_piece(start: int, audio: np.ndarray) -> List[dict]:
+        try:
+            results = await whisper_service.transcribe(audio, language, word_timestamps, model)
+        finally:
+            slots.release()
+        offset = start / SAMPLE_RATE
+        for result in results:
+            result["start"] += offset
+            result["end"] += offset
+            if "words" in result:
+                result["words"] = [(s + offset, e + offset, w) for s, e, w in result["words"]]
+        return results
+
+    async def submit(pieces: List[Tuple[int, np.ndarray]]):
+        for start, audio in pieces:
+            # Waiting here holds back the decoder, and through it the upload
+            await slots.acquire()
+            ordered.put_nowait(asyncio.create_task(transcribe_piece(start, audio)))
+
+    async def on_audio(samples: np.ndarray):
+        # VAD runs off the event loop: it is a model too
+        await submit(await asyncio.to_thread(splitter.add, samples))
+
+    decoder = StreamDecoder(None, SAMPLE_RATE, on_audio)
+
+    async def feed():
+        try:
+            await decoder.start()
+            async for data in _read_upload(upload):
+                await decoder.feed(data)
+            await decoder.finish(timeout=None)
+            if decoder.process.returncode:
+                errors = "; ".join(decoder.get_stats()["errors"])
+                raise RuntimeError(f"Could not decode upload: {errors or 'ffmpeg failed'}")
+            await submit(await asyncio.to_thread(splitter.finish))
+        finally:
+            ordered.put_nowait(None)
+
+    feeder = asyncio.create_task(feed())
+    segments = 0
+    try:
+        while True:
+            task = await ordered.get()
+            if task is None:
+                break
+            for result in await task:
+                segments += 1
+                yield result
+        await feeder
+    except Exception as e:
+        logger.error(f"File transcription error: {e}")
+        yield {"type": "error", "message": str(e)}
+        return
+    finally:
+        feeder.cancel()
+        decoder.kill()
+        while not ordered.empty():
+            task = ordered.get_nowait()
+            if task is not None:
+                task.cancel()
+
+    elapsed = time.monotonic() - started
+    audio_seconds = decoder.samples_out / SAMPLE_RATE
+    yield {
+        "type": "done",
+        "segments": segments,
+        "audio_seconds": round(audio_seconds, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "speed": round(audio_seconds / elapsed, 1) if elapsed else None,
+    }
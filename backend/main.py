@@ -1,17 +1,24 @@
 """FastAPI server for Speech-to-Text with WebSocket support"""
 
+import time
+IMPORT_STARTED = time.monotonic()
+
 import os
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import json
 import logging
 import asyncio
-from typing import Dict, Any
+from collections import Counter
+from typing import Dict, Any, Optional
 
 from contextlib import asynccontextmanager
-from whisper_service import whisper_service
-from audio_processor import AudioProcessor
+from whisper_service import COMPUTE_TYPES, whisper_service
+from session import StreamSession
+from file_transcription import spool_body, transcribe_upload
+from admission import AdmissionController
+from metrics import REGISTRY
 
 # Configure logging
 logging.basicConfig(
@@ -24,37 +31,109 @@ logger = logging.getLogger(__name__)
 class ConnectionManager:
     def __init__(self):
         self.active_connections: list[WebSocket] = []
+        self.sessions: Dict[int, StreamSession] = {}
     
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket) -> Optional[StreamSession]:
+        """Accept a client and admit it as a session, or turn it away when over capacity"""
         await websocket.accept()
+        
+        async def queued():
+            await websocket.send_json({
+                "type": "status",
+                "message": "Server at capacity, waiting for a free slot..."
+            })
+        
+        if not await admission.admit(lambda: whisper_service.default_key, queued):
+            try:
+                await websocket.send_json({
+                    "type": "error",
+                    "code": "over_capacity",
+                    "message": "Server at capacity, try again later",
+                    "retry_after": admission.retry_after_s
+                })
+                # 1013: Try Again Later
+                await websocket.close(code=1013)
+            except Exception:
+                pass
+            return None
+        
+        # No await since admission: the session counts before anyone else is admitted
         self.active_connections.append(websocket)
+        session = StreamSession(websocket)
+        self.sessions[session.id] = session
         logger.info(f"Client connected. Total connections: {len(self.active_connections)}")
+        return session
     
-    def disconnect(self, websocket: WebSocket):
+    def disconnect(self, websocket: WebSocket, session: StreamSession):
         self.active_connections.remove(websocket)
+        self.sessions.pop(session.id, None)
         logger.info(f"Client disconnected. Total connections: {len(self.active_connections)}")
     
     async def send_json(self, websocket: WebSocket, data: dict):
         await websocket.send_json(data)
+    
+    def stream_counts(self) -> Dict[Any, int]:
+        """Connected sessions per model key"""
+        return Counter(session.model_key for session in self.sessions.values())
+    
+    def get_stats(self) -> list:
+        return [session.get_stats() for session in self.sessions.values()]
 
 manager = ConnectionManager()
+admission = AdmissionController(manager.stream_counts)
+
+def collect_live_metrics():
+    """Scrape-time gauges for sessions, queues, executors and the model pool"""
+    sessions = list(manager.sessions.values())
+    yield ("stt_active_sessions", "gauge", "Connected WebSocket sessions",
+           [({}, len(sessions))])
+    yield ("stt_session_queue_depth", "gauge", "Audio chunks waiting for inference per session",
+           [({"session": str(s.id)}, s.queue.qsize()) for s in sessions])
+    yield ("stt_session_dropped_chunks_total", "counter", "Audio chunks dropped by the session queue",
+           [({"session": str(s.id)}, s.queue.dropped_chunks) for s in sessions])
+    executors = whisper_service.executors.get_stats()
+    pools = {f"inference-{d}": e for d, e in executors["inference"].items()}
+    pools["model-load"] = executors["model_loading"]
+    yield ("stt_executor_active", "gauge", "Tasks running on an executor",
+           [({"executor": name}, e["active"]) for name, e in pools.items()])
+    yield ("stt_executor_queued", "gauge", "Tasks waiting for an executor worker",
+           [({"executor": name}, e["queued"]) for name, e in pools.items()])
+    scheduler = whisper_service.scheduler
+    yield ("stt_batch_queue_depth", "gauge", "Requests waiting in the batch scheduler",
+           [({}, scheduler.queue.qsize() if scheduler and scheduler.queue else 0)])
+    yield ("stt_model_pool_memory_mb", "gauge", "Estimated memory of resident models",
+           [({}, whisper_service.pool.used_mb())])
+    remaining = admission.remaining_streams(whisper_service.default_key)
+    if remaining is not None:
+        yield ("stt_admission_remaining_streams", "gauge", "Estimated sessions the server can still admit",
+               [({}, remaining)])
+
+REGISTRY.add_collector(collect_live_metrics)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
     # Startup
-    logger.info("Starting Speech-to-Text server...")
-    # Load default model
-    success = await whisper_service.load_model("small")
-    if success:
-        logger.info("✓ Server ready")
-    else:
-        logger.error("Failed to load initial model")
+    whisper_service.startup_timings["server"] = round(time.monotonic() - IMPORT_STARTED, 3)
+    logger.info(f"Starting Speech-to-Text server (app imported in {whisper_service.startup_timings['server']:.2f}s)...")
+    
+    async def start_service():
+        # Import the runtime, load and warm up the preload list; /ready turns 200 after
+        success = await whisper_service.startup()
+        if success:
+            logger.info(f"✓ Server ready ({whisper_service.startup_timings})")
+        else:
+            logger.error(f"Startup failed: {whisper_service.startup_error}")
+    
+    # In the background, so connections are accepted while models load
+    startup_task = asyncio.create_task(start_service())
     
     yield
     
     # Shutdown
     logger.info("Shutting down Speech-to-Text server...")
+    startup_task.cancel()
+    whisper_service.shutdown()
 
 # Create FastAPI app with lifespan
 app = FastAPI(title="Speech-to-Text API", version="1.0.0", lifespan=lifespan)
@@ -75,124 +154,162 @@ async def root():
         "message": "Speech-to-Text API",
         "endpoints": {
             "websocket": "/ws",
+            "transcribe": "/transcribe",
             "models": "/models",
-            "health": "/health"
+            "health": "/health",
+            "ready": "/ready",
+            "stats": "/stats",
+            "metrics": "/metrics"
         }
     }
 
+def not_ready() -> JSONResponse:
+    """503 for requests that need a model while the server is still starting"""
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "5"},
+        content={"error": "Server is starting up", "phase": whisper_service.startup_phase}
+    )
+
+def startup_status() -> str:
+    if whisper_service.ready:
+        return "healthy" if whisper_service.model_loaded else "degraded"
+    return "unhealthy" if whisper_service.startup_phase == "failed" else "loading"
+
 @app.get("/health")
 async def health():
-    """Health check endpoint"""
+    """Liveness and status; the process is up even while models are loading"""
     return {
-        "status": "healthy",
-        "model_loaded": whisper_service.model is not None,
-        "device": whisper_service.device
+        "status": startup_status(),
+        "phase": whisper_service.startup_phase,
+        "model_loaded": whisper_service.model_loaded,
+        "device": whisper_service.device,
+        "error": whisper_service.startup_error,
+        "timings": whisper_service.startup_timings,
+        # Remaining session capacity, for routing new sessions to less loaded replicas
+        "admission": admission.get_stats()
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 only once the preloaded models are loaded and warmed up"""
+    body = {
+        "ready": whisper_service.ready and whisper_service.model_loaded,
+        "phase": whisper_service.startup_phase,
+        "timings": whisper_service.startup_timings
+    }
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+@app.get("/stats")
+async def stats():
+    """Inference scheduler and per-session queue statistics"""
+    return {
+        **whisper_service.get_stats(),
+        "sessions": manager.get_stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/models")
 async def get_models():
     """Get available models and current status"""
     return whisper_service.get_model_info()
 
 @app.post("/models/{model_name}")
-async def change_model(model_name: str):
-    """Change the active model"""
+async def change_model(model_name: str, compute_type: Optional[str] = None,
+                       cpu_threads: Optional[int] = None, num_workers: Optional[int] = None):
+    """Change the default model (and optionally its runtime settings) for new sessions"""
     if model_name not in whisper_service.models_info:
         return JSONResponse(
             status_code=400,
             content={"error": f"Invalid model: {model_name}"}
         )
+    if compute_type is not None and compute_type not in COMPUTE_TYPES:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Invalid compute_type: {compute_type}"}
+        )
+    if not whisper_service.ready:
+        return not_ready()
+    try:
+        # Rejects out-of-range cpu_threads / num_workers before anything is loaded
+        whisper_service.model_key(model_name, compute_type, cpu_threads, num_workers)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     
-    success = await whisper_service.load_model(model_name)
+    success = await whisper_service.load_model(model_name, compute_type, cpu_threads, num_workers)
     if success:
-        return {"message": f"Model changed to {model_name}", "device": whisper_service.device}
+        return {
+            "message": f"Model changed to {model_name}",
+            "device": whisper_service.device,
+            "settings": whisper_service.default_key._asdict()
+        }
     else:
         return JSONResponse(
             status_code=500,
             content={"error": "Failed to load model"}
         )
 
+@app.post("/transcribe")
+async def transcribe_file(request: Request, language: str = "en", model: Optional[str] = None,
+                          compute_type: Optional[str] = None, word_timestamps: bool = False):
+    """Transcribe an uploaded file (multipart ``file`` field or raw request body)
+
+    Results stream back as JSON lines in file order while later parts are
+    still being decoded, followed by a ``done`` line with throughput figures.
+    """
+    if not whisper_service.ready:
+        return not_ready()
+    key = None
+    if model is not None or compute_type is not None:
+        model_name = model or whisper_service.current_model_size
+        if model_name not in whisper_service.models_info:
+            return JSONResponse(status_code=400, content={"error": f"Invalid model: {model_name}"})
+        try:
+            key = whisper_service.model_key(model_name, compute_type)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+    
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            return JSONResponse(status_code=400, content={"error": "Missing 'file' field"})
+    else:
+        # Read now: once the response starts, the body can no longer be received
+        upload = await spool_body(request.stream())
+    
+    async def lines():
+        try:
+            async for result in transcribe_upload(upload, language, key, word_timestamps):
+                yield json.dumps(result) + "\n"
+        finally:
+            await upload.close()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for audio streaming"""
-    await manager.connect(websocket)
-    audio_processor = AudioProcessor()
-    
     try:
-        # Send initial connection message
-        await manager.send_json(websocket, {
-            "type": "connection",
-            "status": "connected",
-            "model": whisper_service.current_model_size,
-            "device": whisper_service.device
-        })
-        
-        while True:
-            # Receive message from client
-            message = await websocket.receive_json()
-            
-            if message["type"] == "audio":
-                # Process audio data
-                try:
-                    audio_data = message["data"]
-                    format = message.get("format", "webm")
-                    
-                    # Convert audio chunk
-                    audio_array = await audio_processor.process_audio_chunk(audio_data, format)
-                    audio_processor.add_to_buffer(audio_array)
-                    
-                    # Check if we have enough audio to process
-                    if audio_processor.should_process_buffer():
-                        audio_to_process = audio_processor.get_and_clear_buffer()
-                        
-                        # Send processing status
-                        await manager.send_json(websocket, {
-                            "type": "status",
-                            "message": "Processing audio..."
-                        })
-                        
-                        # Transcribe audio
-                        async for result in whisper_service.transcribe_audio(audio_to_process):
-                            await manager.send_json(websocket, result)
-                    
-                except Exception as e:
-                    logger.error(f"Audio processing error: {e}")
-                    await manager.send_json(websocket, {
-                        "type": "error",
-                        "message": f"Audio processing error: {str(e)}"
-                    })
-            
-            elif message["type"] == "change_model":
-                # Change model
-                model_name = message["model"]
-                await manager.send_json(websocket, {
-                    "type": "status",
-                    "message": f"Loading {model_name} model..."
-                })
-                
-                success = await whisper_service.load_model(model_name)
-                if success:
-                    await manager.send_json(websocket, {
-                        "type": "model_changed",
-                        "model": model_name,
-                        "device": whisper_service.device
-                    })
-                else:
-                    await manager.send_json(websocket, {
-                        "type": "error",
-                        "message": "Failed to load model"
-                    })
-            
-            elif message["type"] == "ping":
-                # Respond to ping
-                await manager.send_json(websocket, {"type": "pong"})
+        session = await manager.connect(websocket)
+    except WebSocketDisconnect:
+        # Gave up while queued for admission
+        return
+    if session is None:
+        return
     
+    try:
+        await session.run()
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         logger.info("Client disconnected")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        manager.disconnect(websocket)
+    finally:
+        manager.disconnect(websocket, session)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,223 @@
+"""Lightweight in-process metrics with Prometheus text exposition
+
+Metric families are declared once at module level and children are selected
+with ``.labels(...)``, much like prometheus_client but without the dependency.
+Values that are cheaper to read on demand than to keep updated (active
+sessions, queue depths) are provided by collector callbacks at scrape time.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """Bucketed histogram with Prometheus-style cumulative ``le`` buckets"""
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record a single observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        """Cumulative bucket counts plus sum and count"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = count
+        return {
+            "buckets": cumulative,
+            "sum": total,
+            "count": count,
+            "mean": total / count if count else 0.0,
+        }
+
+
+class Counter:
+    """Monotonically increasing value"""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """Value that can go up and down"""
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items())
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class MetricFamily:
+    """A named metric with a fixed set of label names"""
+
+    def __init__(self, kind: str, name: str, documentation: str,
+                 labelnames: Tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """Return the child for these label values, creating it on first use"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    if self.kind == "histogram":
+                        child = Histogram(self.buckets)
+                    elif self.kind == "counter":
+                        child = Counter()
+                    else:
+                        child = Gauge()
+                    self._children[key] = child
+        return child
+
+    def remove(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self._children.pop(key, None)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            if self.kind == "histogram":
+                snapshot = child.snapshot()
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', bound))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {snapshot['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {snapshot['count']}")
+            else:
+                lines.append(f"{self.name}{_format_labels(labels)} {child.value}")
+        return lines
+
+
+# A collector returns (name, kind, documentation, [(labels, value), ...]) tuples
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class Registry:
+    """All metric families plus scrape-time collectors"""
+
+    def __init__(self):
+        self.families: List[MetricFamily] = []
+        self.collectors: List[Collector] = []
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        self.families.append(family)
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> MetricFamily:
+        return self._register(MetricFamily("counter", name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> MetricFamily:
+        return self._register(MetricFamily("gauge", name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> MetricFamily:
+        return self._register(MetricFamily("histogram", name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for family in self.families:
+            lines.extend(family.render())
+        for collector in self.collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Pipeline stage latencies
+AUDIO_DECODE_SECONDS = REGISTRY.histogram(
+    "stt_audio_decode_seconds", "Time to decode an incoming audio chunk", ("format",))
+BUFFER_WAIT_SECONDS = REGISTRY.histogram(
+    "stt_buffer_wait_seconds", "Time buffered audio waited before being sent for inference")
+EXECUTOR_WAIT_SECONDS = REGISTRY.histogram(
+    "stt_executor_wait_seconds", "Time tasks waited for an executor worker", ("executor",))
+EXECUTOR_RUN_SECONDS = REGISTRY.histogram(
+    "stt_executor_run_seconds", "Time tasks ran on an executor worker", ("executor",))
+INFERENCE_SECONDS = REGISTRY.histogram(
+    "stt_inference_seconds", "Model inference time per call (a batch counts once)", ("model",))
+WS_SEND_SECONDS = REGISTRY.histogram(
+    "stt_ws_send_seconds", "Time to write one message to a WebSocket")
+
+# Throughput and efficiency
+REALTIME_FACTOR = REGISTRY.histogram(
+    "stt_realtime_factor", "Inference time divided by audio duration", ("model", "compute_type"),
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5))
+AUDIO_SECONDS_TOTAL = REGISTRY.counter(
+    "stt_audio_seconds_total", "Seconds of audio transcribed", ("model",))
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "stt_model_load_seconds", "Time taken by the most recent load of a model", ("model", "device", "compute_type"))
+
+# Batching
+BATCH_SIZE = REGISTRY.histogram(
+    "stt_batch_size", "Requests decoded per batched model call", buckets=(1, 2, 4, 8, 16, 32, 64))
+BATCH_WAIT_SECONDS = REGISTRY.histogram(
+    "stt_batch_wait_seconds", "Time requests waited in the batch scheduler",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+
+# Adaptive decoding quality
+QUALITY_LEVEL = REGISTRY.gauge(
+    "stt_quality_level", "Current decoding quality level (0 = full quality)")
+QUALITY_CHANGES_TOTAL = REGISTRY.counter(
+    "stt_quality_changes_total", "Quality level changes", ("direction",))
+
+# Result cache
+RESULT_CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "stt_result_cache_requests_total", "Result cache lookups", ("result",))
+RESULT_CACHE_BYTES = REGISTRY.gauge(
+    "stt_result_cache_bytes", "Size of the in-memory result cache")
+
+# Admission control
+ADMISSION_DECISIONS_TOTAL = REGISTRY.counter(
+    "stt_admission_decisions_total", "WebSocket sessions admitted, queued or rejected", ("result",))
@@ -0,0 +1,92 @@
+"""Binary WebSocket audio protocol (v2)
+
+Protocol v1 sends every audio chunk as JSON with base64-encoded PCM in
+``message["data"]``. Clients that negotiate v2 (``{"type": "hello", "protocol": 2}``)
+send audio as binary WebSocket frames instead, while control messages
+(ping, change_model, ...) stay JSON text frames.
+
+Binary frame layout (little endian, 16 byte header followed by samples):
+
+    offset  size  field
+    0       1     protocol version (2)
+    1       1     sample format (1 = int16, 2 = float32)
+    2       2     channel count
+    4       4     stream id
+    8       4     sample rate in Hz
+    12      4     sequence number
+    16      ...   interleaved PCM samples
+"""
+
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+PROTOCOL_VERSION = 2
+
+FORMAT_INT16 = 1
+FORMAT_FLOAT32 = 2
+
+SAMPLE_DTYPES = {
+    FORMAT_INT16: np.dtype("<i2"),
+    FORMAT_FLOAT32: np.dtype("<f4"),
+}
+
+HEADER = struct.Struct("<BBHIII")
+HEADER_SIZE = HEADER.size
+
+
+class ProtocolError(ValueError):
+    """Raised when a binary frame cannot be decoded"""
+
+
+@dataclass
+class AudioFrame:
+    """Decoded binary audio frame"""
+    stream_id: int
+    sample_format: int
+    channels: int
+    sample_rate: int
+    sequence: int
+    samples: np.ndarray
+
+
+def decode_frame(frame: bytes) -> AudioFrame:
+    """Parse a binary frame; samples are a read-only view over the frame bytes"""
+    if len(frame) < HEADER_SIZE:
+        raise ProtocolError(f"Frame too short: {len(frame)} bytes")
+
+    version, sample_format, channels, stream_id, sample_rate, sequence = HEADER.unpack_from(frame)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version: {version}")
+    dtype = SAMPLE_DTYPES.get(sample_format)
+    if dtype is None:
+        raise ProtocolError(f"Unsupported sample format: {sample_format}")
+    if channels == 0 or sample_rate == 0:
+        raise ProtocolError("Channel count and sample rate must be non-zero")
+
+    payload_size = len(frame) - HEADER_SIZE
+    if payload_size % (dtype.itemsize * channels):
+        raise ProtocolError("Payload is not a whole number of sample frames")
+
+    samples = np.frombuffer(frame, dtype=dtype, offset=HEADER_SIZE)
+    return AudioFrame(stream_id, sample_format, channels, sample_rate, sequence, samples)
+
+
+def encode_frame(samples: np.ndarray, stream_id: int = 0, sequence: int = 0,
+                 sample_rate: int = 16000, channels: int = 1,
+                 sample_format: int = FORMAT_INT16) -> bytes:
+    """Build a binary frame (used by test clients and tooling)"""
+    dtype = SAMPLE_DTYPES[sample_format]
+    if sample_format == FORMAT_INT16 and samples.dtype != dtype:
+        samples = np.clip(samples, -1.0, 1.0) * 32767.0
+    payload = np.ascontiguousarray(samples, dtype=dtype).tobytes()
+    header = HEADER.pack(PROTOCOL_VERSION, sample_format, channels, stream_id, sample_rate, sequence)
+    return header + payload
+
+
+def to_float32(frame: AudioFrame) -> np.ndarray:
+    """Convert frame samples to float32 in [-1, 1]; float32 frames are returned without copying"""
+    if frame.sample_format == FORMAT_FLOAT32:
+        return frame.samples
+    return frame.samples.astype(np.float32) * (1.0 / 32768.0)
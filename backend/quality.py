@@ -0,0 +1,149 @@
+"""Load-adaptive decoding quality
+
+Under a traffic spike, decoding every chunk with beam search and temperature
+fallback makes latency grow without bound. The controller watches the
+inference backlog and the measured real-time factor. When the server falls
+behind it steps down a ladder of cheaper decoding settings, and it climbs back
+up once load has stayed low for a while. Level 0 is full quality.
+
+The ladder can be replaced with ``QUALITY_LADDER``, a JSON list of objects with
+the ``QualityLevel`` fields.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, List, Optional
+
+from metrics import QUALITY_CHANGES_TOTAL, QUALITY_LEVEL
+from src.env import env_flag
+
+logger = logging.getLogger(__name__)
+
+QUALITY_ADAPTIVE = env_flag("QUALITY_ADAPTIVE", True)
+# Step down when the smoothed real-time factor or the backlog per worker exceeds these
+QUALITY_RTF_HIGH = float(os.getenv("QUALITY_RTF_HIGH", "0.8"))
+QUALITY_BACKLOG_HIGH = float(os.getenv("QUALITY_BACKLOG_HIGH", "2"))
+# Step up after load stayed below these for QUALITY_RECOVER_S
+QUALITY_RTF_LOW = float(os.getenv("QUALITY_RTF_LOW", "0.4"))
+QUALITY_BACKLOG_LOW = float(os.getenv("QUALITY_BACKLOG_LOW", "0.5"))
+QUALITY_RECOVER_S = float(os.getenv("QUALITY_RECOVER_S", "10"))
+# Minimum time between two steps, so each step's effect is measured before the next
+QUALITY_INTERVAL_S = float(os.getenv("QUALITY_INTERVAL_S", "2"))
+
+# faster-whisper's default temperature fallback schedule
+FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    """Decoding settings for one rung of the ladder"""
+    name: str
+    beam_size: int = 5
+    temperature_fallback: bool = True
+    # Multiplier for the non-streaming chunk length and the streaming re-decode step
+    chunk_scale: float = 1.0
+
+    def decode_options(self) -> dict:
+        """Keyword arguments for ``WhisperModel.transcribe``"""
+        return {
+            "beam_size": self.beam_size,
+            "temperature": FALLBACK_TEMPERATURES if self.temperature_fallback else 0.0,
+        }
+
+
+DEFAULT_LADDER = (
+    QualityLevel("full", beam_size=5, temperature_fallback=True, chunk_scale=1.0),
+    QualityLevel("reduced", beam_size=2, temperature_fallback=True, chunk_scale=1.0),
+    QualityLevel("fast", beam_size=1, temperature_fallback=False, chunk_scale=1.5),
+    QualityLevel("minimal", beam_size=1, temperature_fallback=False, chunk_scale=2.0),
+)
+
+
+def load_ladder() -> List[QualityLevel]:
+    config = os.getenv("QUALITY_LADDER")
+    if not config:
+        return list(DEFAULT_LADDER)
+    return [QualityLevel(**level) for level in json.loads(config)]
+
+
+class QualityController:
+    """Chooses the current quality level from backlog and real-time factor"""
+
+    def __init__(self, backlog: Callable[[], float], ladder: Optional[List[QualityLevel]] = None,
+                 adaptive: bool = QUALITY_ADAPTIVE):
+        self.ladder = ladder or load_ladder()
+        self.adaptive = adaptive
+        # Queued inference work per worker, supplied by the service
+        self._backlog = backlog
+        self.index = 0
+        self.rtf = 0.0
+        self.degrades = 0
+        self.recoveries = 0
+        self._last_change = 0.0
+        self._calm_since: Optional[float] = None
+        self._lock = threading.Lock()
+        QUALITY_LEVEL.labels().set(0)
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.ladder[self.index]
+
+    def observe(self, realtime_factor: float):
+        """Feed one measured real-time factor (called from inference workers)"""
+        with self._lock:
+            # Exponential moving average so one slow call does not trigger a step
+            self.rtf = realtime_factor if self.rtf == 0.0 else 0.8 * self.rtf + 0.2 * realtime_factor
+
+    def update(self) -> QualityLevel:
+        """Re-evaluate load and return the level to decode with"""
+        if not self.adaptive:
+            return self.level
+
+        now = time.monotonic()
+        backlog = self._backlog()
+        with self._lock:
+            overloaded = self.rtf > QUALITY_RTF_HIGH or backlog > QUALITY_BACKLOG_HIGH
+            calm = self.rtf < QUALITY_RTF_LOW and backlog <= QUALITY_BACKLOG_LOW
+            if not calm:
+                self._calm_since = None
+            elif self._calm_since is None:
+                self._calm_since = now
+
+            if now - self._last_change < QUALITY_INTERVAL_S:
+                return self.level
+            if overloaded and self.index < len(self.ladder) - 1:
+                self._step(+1, now, f"rtf={self.rtf:.2f} backlog={backlog:.1f}")
+            elif (calm and self.index > 0 and self._calm_since is not None
+                    and now - self._calm_since >= QUALITY_RECOVER_S):
+                self._step(-1, now, f"rtf={self.rtf:.2f} backlog={backlog:.1f}")
+                self._calm_since = now
+            return self.level
+
+    def _step(self, direction: int, now: float, reason: str):
+        previous = self.level.name
+        self.index += direction
+        self._last_change = now
+        if direction > 0:
+            self.degrades += 1
+        else:
+            self.recoveries += 1
+        QUALITY_LEVEL.labels().set(self.index)
+        QUALITY_CHANGES_TOTAL.labels(direction="down" if direction > 0 else "up").inc()
+        logger.info(f"Decoding quality {previous} -> {self.level.name} ({reason})")
+
+    def get_stats(self) -> dict:
+        return {
+            "adaptive": self.adaptive,
+            "level": self.index,
+            "name": self.level.name,
+            "settings": asdict(self.level),
+            "realtime_factor": round(self.rtf, 3),
+            "backlog": round(self._backlog(), 2),
+            "degrades": self.degrades,
+            "recoveries": self.recoveries,
+            "ladder": [level.name for level in self.ladder],
+        }
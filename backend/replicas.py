@@ -0,0 +1,273 @@
+"""Multi-process model replicas for CPU nodes
+
+A single in-process WhisperModel leaves most cores of a large CPU box idle and
+competes with the event loop for the GIL. With ``WHISPER_CPU_REPLICAS=N`` each
+CPU model runs as N worker processes, each with its own share of the cores
+(``cpu_threads``). Audio is written to a per-worker shared-memory slab instead
+of being pickled, requests go to the least-loaded worker, and a worker that
+crashes fails its in-flight request and is restarted automatically.
+"""
+
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CPU_REPLICAS = int(os.getenv("WHISPER_CPU_REPLICAS", "0"))
+
+# Initial slab size per worker; grown on demand
+INITIAL_SLAB_SECONDS = 60
+SAMPLE_RATE = 16000
+
+
+def _worker_main(conn, model_size: str, compute_type: str, cpu_threads: int):
+    """Worker process: load one model and serve transcription requests from the pipe"""
+    from faster_whisper import WhisperModel
+    from segments import segment_to_dict
+    from src.model_store import load_options, resolve_model
+
+    try:
+        model_path = resolve_model(model_size, compute_type)
+        model = WhisperModel(model_path, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads,
+                             **load_options(model_path))
+    except Exception as e:
+        conn.send(("error", None, str(e)))
+        return
+    conn.send(("ready", os.getpid()))
+
+    shm = None
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] == "stop":
+            break
+
+        _, request_id, shm_name, n_samples, options = message
+        try:
+            if shm is None or shm.name != shm_name:
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=shm_name)
+            audio = np.ndarray((n_samples,), dtype=np.float32, buffer=shm.buf)
+            segments, _ = model.transcribe(audio, **options)
+            results = [segment_to_dict(segment) for segment in segments]
+            del audio
+            conn.send(("result", request_id, results))
+        except Exception as e:
+            conn.send(("error", request_id, str(e)))
+
+    if shm is not None:
+        shm.close()
+
+
+class Replica:
+    """Parent-side handle for one worker process"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.lock = asyncio.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.restarts = 0
+        self.inflight = {}
+
+    def ensure_slab(self, n_samples: int) -> shared_memory.SharedMemory:
+        """Return a slab large enough for ``n_samples`` float32 samples"""
+        needed = n_samples * 4
+        if self.shm is None or self.shm.size < needed:
+            if self.shm is not None:
+                self.shm.close()
+                self.shm.unlink()
+            size = max(needed * 2, INITIAL_SLAB_SECONDS * SAMPLE_RATE * 4)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        return self.shm
+
+    def release_slab(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class ReplicaPool:
+    """N worker processes serving the same model, with least-loaded dispatch"""
+
+    def __init__(self, model_size: str, compute_type: str, replicas: int = CPU_REPLICAS,
+                 cpu_threads: Optional[int] = None):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.size = max(1, replicas)
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // self.size)
+        self._ctx = mp.get_context("spawn")
+        self._replicas = [Replica(i) for i in range(self.size)]
+        self._request_ids = 0
+        self._stopping = False
+
+    def start(self):
+        """Spawn all workers and wait until their models are loaded (blocking)"""
+        try:
+            for replica in self._replicas:
+                self._spawn(replica)
+                threading.Thread(target=self._reader, args=(replica,), daemon=True,
+                                 name=f"replica-{replica.index}-reader").start()
+        except BaseException:
+            # Do not leave the workers that did start (or their slabs) behind
+            self.stop()
+            raise
+        logger.info(
+            f"✓ {self.size} {self.model_size} replicas ready ({self.cpu_threads} CPU threads each)"
+        )
+
+    def _spawn(self, replica: Replica):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.model_size, self.compute_type, self.cpu_threads),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        try:
+            message = parent_conn.recv()
+        except (EOFError, OSError):
+            message = ("error", None, f"worker exited with code {process.exitcode}")
+        if message[0] != "ready":
+            parent_conn.close()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+            raise RuntimeError(f"Replica {replica.index} failed to load model: {message[2]}")
+        replica.process = process
+        replica.conn = parent_conn
+
+    def _reader(self, replica: Replica):
+        """Resolve request futures from worker replies; restart the worker if it dies"""
+        while not self._stopping:
+            try:
+                kind, request_id, payload = replica.conn.recv()
+            except (EOFError, OSError):
+                if self._stopping:
+                    return
+                self._handle_crash(replica)
+                continue
+
+            entry = replica.inflight.pop(request_id, None)
+            if entry is None:
+                continue
+            loop, future = entry
+            if kind == "result":
+                loop.call_soon_threadsafe(_set_result, future, payload)
+            else:
+                loop.call_soon_threadsafe(_set_exception, future, RuntimeError(payload))
+
+    def _handle_crash(self, replica: Replica):
+        exitcode = replica.process.exitcode if replica.process else None
+        logger.error(f"Replica {replica.index} died (exit code {exitcode}); restarting")
+        for loop, future in replica.inflight.values():
+            loop.call_soon_threadsafe(
+                _set_exception, future, RuntimeError(f"Replica {replica.index} crashed")
+            )
+        replica.inflight.clear()
+        while not self._stopping:
+            try:
+                self._spawn(replica)
+                replica.restarts += 1
+                return
+            except Exception as e:
+                logger.error(f"Replica {replica.index} restart failed: {e}")
+                time.sleep(1)
+
+    async def transcribe(self, audio: np.ndarray, options: dict) -> List[dict]:
+        """Transcribe on the least-loaded worker
+
+        The worker's slot (its lock, slab and ``pending`` count) stays taken
+        until the worker replies, even if the caller is cancelled meanwhile:
+        the worker is still reading the slab.
+        """
+        replica = min(self._replicas, key=lambda r: r.pending)
+        replica.pending += 1
+        try:
+            await replica.lock.acquire()
+        except BaseException:
+            replica.pending -= 1
+            raise
+
+        self._request_ids += 1
+        request_id = self._request_ids
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            shm = replica.ensure_slab(len(audio))
+            np.ndarray((len(audio),), dtype=np.float32, buffer=shm.buf)[:] = audio
+            replica.inflight[request_id] = (loop, future)
+            replica.conn.send(("transcribe", request_id, shm.name, len(audio), options))
+        except BaseException:
+            replica.inflight.pop(request_id, None)
+            self._release_slot(replica, future)
+            raise
+        future.add_done_callback(lambda done: self._release_slot(replica, done))
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def _release_slot(replica: Replica, future: asyncio.Future):
+        """Free the worker for the next request once its reply (or failure) is in"""
+        if future.done() and not future.cancelled() and future.exception() is None:
+            replica.completed += 1
+        replica.pending -= 1
+        replica.lock.release()
+
+    def stop(self):
+        """Stop all workers and release their shared memory"""
+        self._stopping = True
+        for replica in self._replicas:
+            try:
+                if replica.conn is not None:
+                    replica.conn.send(("stop",))
+            except (OSError, BrokenPipeError):
+                pass
+            if replica.process is not None:
+                replica.process.join(timeout=5)
+                if replica.process.is_alive():
+                    replica.process.terminate()
+            replica.release_slab()
+
+    def get_stats(self) -> dict:
+        return {
+            "model": self.model_size,
+            "compute_type": self.compute_type,
+            "cpu_threads": self.cpu_threads,
+            "replicas": [
+                {
+                    "index": r.index,
+                    "pid": r.process.pid if r.process else None,
+                    "alive": bool(r.process and r.process.is_alive()),
+                    "pending": r.pending,
+                    "completed": r.completed,
+                    "restarts": r.restarts,
+                }
+                for r in self._replicas
+            ],
+        }
+
+
+def _set_result(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exc: Exception):
+    if not future.done():
+        future.set_exception(exc)
@@ -0,0 +1,99 @@
+"""Streaming polyphase resampler for PCM input
+
+Clients capture at the hardware rate (44.1/48 kHz, 8 kHz from telephony) and
+send it as is. Each stream gets a ``PolyphaseResampler`` that converts to the
+model rate with a Kaiser-windowed sinc filter split into ``L`` phases. Every
+output sample is one dot product over ``taps`` input samples, computed for a
+whole chunk at once with numpy. The last ``taps - 1`` input samples and the
+output phase carry over to the next chunk, so chunk boundaries are seamless.
+Filter banks depend only on the rate ratio and are shared between streams.
+"""
+
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+
+# Filter zero crossings on each side of the centre; higher = sharper, slower
+ZERO_CROSSINGS = 16
+KAISER_BETA = 8.6
+# Passband edge as a fraction of the lower Nyquist frequency
+ROLLOFF = 0.94
+
+
+def design_filter(up: int, down: int, zero_crossings: int = ZERO_CROSSINGS) -> np.ndarray:
+    """Polyphase bank of shape (up, taps): row ``p`` filters output phase ``p``"""
+    factor = max(up, down)
+    taps = int(np.ceil(2 * zero_crossings * factor / up))
+    length = taps * up
+    cutoff = ROLLOFF / (2 * factor)  # cycles per sample at the upsampled rate
+    n = np.arange(length) - (length - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, KAISER_BETA)
+    h *= up / h.sum()  # unity DC gain after zero-stuffing
+    # h[p + i * up] is tap i of phase p; reverse the taps so rows dot with oldest-first input
+    return h.reshape(taps, up).T[:, ::-1].astype(np.float32)
+
+
+@lru_cache(maxsize=32)
+def filter_bank(up: int, down: int) -> np.ndarray:
+    """Shared, read-only ``design_filter`` result for one rate ratio"""
+    bank = design_filter(up, down)
+    bank.flags.writeable = False
+    return bank
+
+
+class PolyphaseResampler:
+    """Rational-ratio resampler that keeps its state across chunks"""
+
+    def __init__(self, input_rate: int, output_rate: int):
+        divisor = gcd(input_rate, output_rate)
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.bank = filter_bank(self.up, self.down)
+        self.taps = self.bank.shape[1]
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        # Position of the next output on the upsampled grid, relative to _history[0]
+        self._position = (self.taps - 1) * self.up
+
+    @property
+    def passthrough(self) -> bool:
+        return self.up == self.down
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Resample the next chunk of a mono stream"""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if self.passthrough:
+            return samples
+
+        buffer = np.concatenate([self._history, samples])
+        # Outputs whose newest input sample is already available
+        count = max(0, -(-(len(buffer) * self.up - self._position) // self.down))
+        if count:
+            positions = self._position + np.arange(count) * self.down
+            newest = positions // self.up
+            phases = positions % self.up
+            # Row k holds the taps input samples ending at newest[k]
+            windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps)
+            output = np.einsum("ij,ij->i", windows[newest - (self.taps - 1)], self.bank[phases])
+        else:
+            output = np.zeros(0, dtype=np.float32)
+
+        keep = self.taps - 1
+        consumed = len(buffer) - keep
+        self._history = buffer[consumed:].copy()
+        self._position += count * self.down - consumed * self.up
+        return output.astype(np.float32, copy=False)
+
+    def reset(self):
+        self._history[:] = 0
+        self._position = (self.taps - 1) * self.up
+
+
+def downmix(samples: np.ndarray, channels: int) -> np.ndarray:
+    """Average interleaved channels to mono"""
+    if channels <= 1:
+        return samples
+    usable = len(samples) - len(samples) % channels
+    return samples[:usable].reshape(-1, channels).mean(axis=1, dtype=np.float32)
@@ -0,0 +1,143 @@
+"""Content-addressed cache of transcription results
+
+Retries after a disconnect, recurring voicemail prompts and QA replays send
+byte-identical audio again and again. Results are keyed by a hash of the
+float32 samples plus everything that changes the output: model, device,
+compute type, language and decoding options. A hit returns the stored
+segments without touching the inference executor.
+
+The in-memory tier is an LRU bounded by ``RESULT_CACHE_MB``. Setting
+``RESULT_CACHE_DIR`` adds an on-disk tier (one JSON file per entry) that
+survives restarts and is shared by every process using the same directory.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from metrics import RESULT_CACHE_BYTES, RESULT_CACHE_REQUESTS_TOTAL
+from src.env import env_flag
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_ENABLED = env_flag("RESULT_CACHE_ENABLED", True)
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "64"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")
+
+
+def cache_key(audio: np.ndarray, **options) -> str:
+    """Hash of the samples and the options that affect the transcript"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    digest.update(np.ascontiguousarray(audio, dtype=np.float32).data)
+    return digest.hexdigest()
+
+
+def _copy(results: List[dict]) -> List[dict]:
+    # Callers annotate and shift results in place; never hand out stored objects
+    return [dict(result) for result in results]
+
+
+class ResultCache:
+    """Size-bounded LRU of results with an optional directory tier"""
+
+    def __init__(self, max_mb: float = RESULT_CACHE_MB, directory: str = RESULT_CACHE_DIR,
+                 enabled: bool = RESULT_CACHE_ENABLED):
+        self.enabled = enabled
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.directory = directory or None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled and self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, results: List[dict], size: int):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (results, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            RESULT_CACHE_BYTES.labels().set(self._bytes)
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        """Stored results for ``key`` or None (may read from disk; call off the event loop)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+        if entry is not None:
+            RESULT_CACHE_REQUESTS_TOTAL.labels(result="memory_hit").inc()
+            return _copy(entry[0])
+
+        if self.directory:
+            try:
+                with open(self._path(key), "r") as f:
+                    payload = f.read()
+                results = json.loads(payload)
+            except (OSError, ValueError):
+                results = None
+            if results is not None:
+                self.disk_hits += 1
+                RESULT_CACHE_REQUESTS_TOTAL.labels(result="disk_hit").inc()
+                self._remember(key, results, len(payload))
+                return _copy(results)
+
+        self.misses += 1
+        RESULT_CACHE_REQUESTS_TOTAL.labels(result="miss").inc()
+        return None
+
+    def put(self, key: str, results: List[dict]):
+        """Store results (writes through to disk when configured; call off the event loop)"""
+        if not self.enabled:
+            return
+        payload = json.dumps(results)
+        stored = json.loads(payload)  # detached copy, identical to what disk returns
+        self._remember(key, stored, len(payload))
+        if self.directory:
+            path = self._path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write then rename so concurrent readers never see a partial file
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "w") as f:
+                    f.write(payload)
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.warning(f"Result cache write failed: {e}")
+
+    def get_stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "memory_mb": round(self._bytes / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "directory": self.directory,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,19 @@
+"""Transcription messages built from faster-whisper segments
+
+Kept apart from ``whisper_service`` so replica worker processes can use it
+without importing (and constructing) the service.
+"""
+
+
+def segment_to_dict(segment, offset: float = 0.0) -> dict:
+    """Transcription message for a faster-whisper segment, shifted back by ``offset`` seconds"""
+    result = {
+        "type": "transcription",
+        "text": segment.text.strip(),
+        "start": segment.start - offset,
+        "end": segment.end - offset,
+        "final": True
+    }
+    if segment.words:
+        result["words"] = [(w.start - offset, w.end - offset, w.word) for w in segment.words]
+    return result
@@ -0,0 +1,505 @@
+"""Per-connection streaming session: receiver, inference and sender tasks
+
+The receiver reads the socket and decodes audio, the inference task buffers
+and transcribes it, and the sender writes results back. They are connected by
+a bounded audio queue and an outbox, so a slow decode never stops the socket
+from being read (pings and control messages keep flowing) and results are
+coalesced before sending.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+
+from whisper_service import ModelKey, whisper_service
+from audio_processor import AudioProcessor
+from protocol import PROTOCOL_VERSION, HEADER_SIZE, FORMAT_INT16, FORMAT_FLOAT32, decode_frame
+from src.env import env_flag
+from src.streaming import StreamingTranscriber, words_to_text
+from metrics import WS_SEND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Sliding-window streaming defaults (sessions can opt in/out via the hello message)
+STREAMING_MODE = env_flag("STREAMING_MODE", True)
+STREAMING_STEP_MS = float(os.getenv("STREAMING_STEP_MS", "500"))
+STREAMING_MAX_WINDOW_S = float(os.getenv("STREAMING_MAX_WINDOW_S", "15"))
+
+# Audio chunks that may wait for the inference task, and what to do beyond that
+SESSION_QUEUE_SIZE = int(os.getenv("SESSION_QUEUE_SIZE", "16"))
+SESSION_OVERFLOW_POLICY = os.getenv("SESSION_OVERFLOW_POLICY", "drop_oldest")
+OVERFLOW_POLICIES = ("drop_oldest", "merge", "backpressure")
+
+_session_ids = itertools.count(1)
+
+
+def create_streamer(sample_rate: int) -> StreamingTranscriber:
+    return StreamingTranscriber(
+        sample_rate=sample_rate,
+        step_ms=STREAMING_STEP_MS,
+        max_window_s=STREAMING_MAX_WINDOW_S
+    )
+
+
+def streaming_message(words, final: bool) -> dict:
+    """Transcription message for committed (final) or partial words"""
+    return {
+        "type": "transcription",
+        "text": words_to_text(words),
+        "start": words[0][0],
+        "end": words[-1][1],
+        "final": final,
+        "quality": whisper_service.quality.level.name
+    }
+
+
+class AudioQueue:
+    """Bounded queue of decoded audio between the receiver and inference tasks
+
+    Control items (flush) are never dropped and do not count against the limit.
+    When the audio limit is reached the overflow policy decides:
+
+    - ``drop_oldest``: discard the oldest queued chunk
+    - ``merge``: append the new samples to the newest queued chunk
+    - ``backpressure``: stop reading the socket until there is room
+    """
+
+    def __init__(self, maxsize: int = SESSION_QUEUE_SIZE, policy: str = SESSION_OVERFLOW_POLICY):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self._items = deque()
+        self._audio_items = 0
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self.dropped_chunks = 0
+        self.dropped_samples = 0
+        self.merged_chunks = 0
+        self.backpressure_events = 0
+
+    def qsize(self) -> int:
+        """Queued audio chunks"""
+        return self._audio_items
+
+    def full(self) -> bool:
+        return self._audio_items >= self.maxsize
+
+    def _append(self, kind: str, payload=None):
+        self._items.append((kind, payload))
+        if kind == "audio":
+            self._audio_items += 1
+            if self.full():
+                self._not_full.clear()
+        self._not_empty.set()
+
+    async def put_audio(self, samples: np.ndarray) -> str:
+        """Queue audio; returns "queued", "dropped", "merged" or "backpressure" """
+        if not self.full():
+            self._append("audio", samples)
+            return "queued"
+
+        if self.policy == "drop_oldest":
+            for index, (kind, payload) in enumerate(self._items):
+                if kind == "audio":
+                    del self._items[index]
+                    self._audio_items -= 1
+                    self.dropped_chunks += 1
+                    self.dropped_samples += len(payload)
+                    break
+            self._append("audio", samples)
+            return "dropped"
+
+        if self.policy == "merge" and self._items and self._items[-1][0] == "audio":
+            self._items[-1] = ("audio", np.concatenate([self._items[-1][1], samples]))
+            self.merged_chunks += 1
+            return "merged"
+
+        if self.policy == "backpressure":
+            self.backpressure_events += 1
+            await self._not_full.wait()
+            self._append("audio", samples)
+            return "backpressure"
+
+        # Merge with a control item at the tail: keep ordering and exceed by one
+        self._append("audio", samples)
+        return "queued"
+
+    def put_control(self, kind: str):
+        self._append(kind)
+
+    async def get_all(self) -> list:
+        """Wait for at least one item and take everything queued"""
+        await self._not_empty.wait()
+        items = list(self._items)
+        self._items.clear()
+        self._audio_items = 0
+        self._not_empty.clear()
+        self._not_full.set()
+        return items
+
+    def get_stats(self) -> dict:
+        return {
+            "depth": self.qsize(),
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "dropped_chunks": self.dropped_chunks,
+            "dropped_samples": self.dropped_samples,
+            "merged_chunks": self.merged_chunks,
+            "backpressure_events": self.backpressure_events,
+        }
+
+
+class StreamSession:
+    """One WebSocket client: protocol state, audio pipeline and its tasks"""
+
+    def __init__(self, websocket: WebSocket):
+        self.id = next(_session_ids)
+        self.websocket = websocket
+        self.audio_processor = AudioProcessor()
+        self.protocol_version = 1
+        # Each session decodes with its own model; None follows the server default
+        self.model = whisper_service.default_key
+        self.streamer = create_streamer(self.audio_processor.sample_rate) if STREAMING_MODE else None
+        self.queue = AudioQueue()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.sent_messages = 0
+        self.coalesced_messages = 0
+        self._background = set()
+
+    @property
+    def model_key(self) -> Optional[ModelKey]:
+        """The model this session decodes with"""
+        return self.model or whisper_service.default_key
+
+    # --- Sending -----------------------------------------------------------
+
+    def send(self, data: dict):
+        """Queue a message for the sender task"""
+        self.outbox.put_nowait(data)
+
+    async def sender(self):
+        """Write queued messages, dropping partials that a newer result supersedes"""
+        while True:
+            batch = [await self.outbox.get()]
+            while not self.outbox.empty():
+                batch.append(self.outbox.get_nowait())
+
+            last_transcription = max(
+                (i for i, m in enumerate(batch) if m.get("type") == "transcription"),
+                default=-1
+            )
+            for index, message in enumerate(batch):
+                if (message.get("type") == "transcription" and not message.get("final")
+                        and index < last_transcription):
+                    self.coalesced_messages += 1
+                    continue
+                started = time.perf_counter()
+                await self.websocket.send_json(message)
+                WS_SEND_SECONDS.labels().observe(time.perf_counter() - started)
+                self.sent_messages += 1
+
+    # --- Inference ---------------------------------------------------------
+
+    def send_streaming_update(self, committed, partial):
+        if committed:
+            self.send(streaming_message(committed, final=True))
+        if partial:
+            self.send(streaming_message(partial, final=False))
+
+    async def run_streaming_step(self):
+        """Re-decode the current window and emit committed and partial text"""
+        window_samples = len(self.audio_processor.audio_buffer)
+        # Re-decode less often while the server has lowered decoding quality
+        if not self.streamer.ready(window_samples, whisper_service.quality.level.chunk_scale):
+            return
+
+        # No copy: only this task writes the ring, and it waits for the decode
+        window = self.audio_processor.get_buffer_view()
+        self.audio_processor.mark_dispatched()
+        words = await whisper_service.transcribe_words(window, model=self.model)
+        update = self.streamer.update(words, len(window))
+        self.audio_processor.audio_buffer.consume(update.trim_samples)
+        self.send_streaming_update(update.committed, update.partial)
+
+    async def flush_audio(self):
+        """Finish the current utterance: commit pending text or transcribe the remainder"""
+        streamer = self.streamer
+        if streamer is not None:
+            if streamer.pending_samples and len(self.audio_processor.audio_buffer) > 0:
+                # Decode the tail that arrived since the last step
+                window = self.audio_processor.get_buffer_view()
+                self.audio_processor.mark_dispatched()
+                words = await whisper_service.transcribe_words(window, model=self.model)
+                update = streamer.update(words, len(window))
+                self.send_streaming_update(update.committed, [])
+            self.send_streaming_update(streamer.finish(), [])
+            streamer.reset()
+            self.audio_processor.clear_buffer()
+        elif len(self.audio_processor.audio_buffer) > 0:
+            audio_to_process = self.audio_processor.get_and_clear_buffer()
+            async for result in whisper_service.transcribe_audio(audio_to_process, model=self.model):
+                self.send(result)
+
+    async def handle_audio(self, audio_array: np.ndarray):
+        """Pass speech through the session VAD; transcribe at utterance endpoints"""
+        for speech, ends_utterance in self.audio_processor.split_speech(audio_array):
+            if len(speech):
+                await self.buffer_audio(speech)
+            if ends_utterance:
+                await self.flush_audio()
+
+    async def buffer_audio(self, audio_array: np.ndarray):
+        """Buffer decoded audio and transcribe once enough has accumulated"""
+        audio_processor = self.audio_processor
+        dropped = audio_processor.add_to_buffer(audio_array)
+        if dropped:
+            if self.streamer is not None:
+                # The oldest window audio is gone; keep stream time consistent
+                self.streamer.window_offset += dropped / audio_processor.sample_rate
+            self.send({
+                "type": "buffer_overflow",
+                "dropped_ms": (dropped / audio_processor.sample_rate) * 1000,
+                **audio_processor.get_buffer_stats()
+            })
+
+        if self.streamer is not None:
+            self.streamer.add_samples(len(audio_array))
+            await self.run_streaming_step()
+            return
+
+        # Without VAD endpoints, fall back to fixed-size chunks
+        if audio_processor.vad is None and audio_processor.should_process_buffer(
+                whisper_service.quality.level.chunk_scale):
+            audio_to_process = audio_processor.get_and_clear_buffer()
+
+            # Send processing status
+            self.send({
+                "type": "status",
+                "message": "Processing audio..."
+            })
+
+            # Transcribe audio
+            async for result in whisper_service.transcribe_audio(audio_to_process, model=self.model):
+                self.send(result)
+
+    async def inference(self):
+        """Consume queued audio; everything that queued up during a decode is handled in one pass"""
+        while True:
+            items = await self.queue.get_all()
+            pending = []
+            try:
+                for kind, payload in items:
+                    if kind == "audio":
+                        pending.append(payload)
+                        continue
+                    if pending:
+                        await self.handle_audio(np.concatenate(pending))
+                        pending = []
+                    if kind == "flush":
+                        await self.flush_audio()
+                if pending:
+                    await self.handle_audio(np.concatenate(pending))
+            except Exception as e:
+                logger.error(f"Session {self.id} inference error: {e}")
+                self.send({
+                    "type": "error",
+                    "message": f"Audio processing error: {str(e)}"
+                })
+
+    # --- Receiving ---------------------------------------------------------
+
+    async def enqueue_audio(self, audio_array: np.ndarray):
+        result = await self.queue.put_audio(audio_array)
+        if result == "dropped":
+            logger.warning(f"Session {self.id} falling behind: dropped oldest queued chunk")
+            self.send({"type": "queue_overflow", **self.queue.get_stats()})
+        elif result == "backpressure":
+            self.send({"type": "backpressure", **self.queue.get_stats()})
+
+    async def change_model(self, key: ModelKey):
+        """Load the requested model without blocking the receiver"""
+        model_name = key.size
+        try:
+            handle = await whisper_service.get_model(key)
+            self.model = handle.key
+            self.send({
+                "type": "model_changed",
+                "model": model_name,
+                "device": whisper_service.device,
+                "settings": handle.key._asdict()
+            })
+        except Exception as e:
+            logger.error(f"Failed to load model {model_name}: {e}")
+            self.send({
+                "type": "error",
+                "message": "Failed to load model"
+            })
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def handle_message(self, message: dict):
+        """Handle a JSON control (or v1 audio) message"""
+        if message["type"] == "hello":
+            # Negotiate protocol version
+            requested = int(message.get("protocol", 1))
+            self.protocol_version = PROTOCOL_VERSION if requested >= PROTOCOL_VERSION else 1
+            if "streaming" in message:
+                self.streamer = create_streamer(self.audio_processor.sample_rate) if message["streaming"] else None
+            self.send({
+                "type": "hello",
+                "protocol": self.protocol_version,
+                "streaming": self.streamer is not None,
+                "header_size": HEADER_SIZE,
+                "sample_formats": {"int16": FORMAT_INT16, "float32": FORMAT_FLOAT32},
+                "sample_rate": self.audio_processor.sample_rate
+            })
+
+        elif message["type"] == "audio":
+            # Process audio data
+            try:
+                audio_data = message["data"]
+                format = message.get("format", "webm")
+
+                if self.audio_processor.uses_stream_decoder(format):
+                    # Decoded audio reaches the queue as the session's ffmpeg produces it
+                    await self.audio_processor.feed_stream(audio_data, format, self.enqueue_audio)
+                    return
+
+                # Convert audio chunk
+                audio_array = await self.audio_processor.process_audio_chunk(
+                    audio_data, format,
+                    sample_rate=message.get("sample_rate"),
+                    channels=int(message.get("channels", 1))
+                )
+                await self.enqueue_audio(audio_array)
+
+            except Exception as e:
+                logger.error(f"Audio processing error: {e}")
+                self.send({
+                    "type": "error",
+                    "message": f"Audio processing error: {str(e)}"
+                })
+
+        elif message["type"] == "change_model":
+            # Change this session's model (other sessions keep theirs)
+            model_name = message["model"]
+            if model_name not in whisper_service.models_info:
+                self.send({
+                    "type": "error",
+                    "message": f"Invalid model: {model_name}"
+                })
+                return
+            try:
+                key = whisper_service.model_key(
+                    model_name,
+                    compute_type=message.get("compute_type"),
+                    cpu_threads=message.get("cpu_threads"),
+                    num_workers=message.get("num_workers")
+                )
+            except ValueError as e:
+                self.send({
+                    "type": "error",
+                    "message": str(e)
+                })
+                return
+
+            self.send({
+                "type": "status",
+                "message": f"Loading {model_name} model ({key.compute_type})..."
+            })
+            self._spawn(self.change_model(key))
+
+        elif message["type"] == "flush":
+            # Client stopped recording: decode what the stream decoder still holds first
+            try:
+                await self.audio_processor.finish_stream()
+            finally:
+                self.queue.put_control("flush")
+
+        elif message["type"] == "ping":
+            # Respond to ping
+            self.send({"type": "pong"})
+
+    async def handle_binary(self, data: bytes):
+        """Handle a protocol v2 binary audio frame"""
+        if self.protocol_version < PROTOCOL_VERSION:
+            self.send({
+                "type": "error",
+                "message": "Binary audio frames require protocol 2 (send a hello message first)"
+            })
+            return
+        try:
+            frame = decode_frame(data)
+            await self.enqueue_audio(await self.audio_processor.process_binary_frame(frame))
+        except Exception as e:
+            logger.error(f"Binary frame error: {e}")
+            self.send({
+                "type": "error",
+                "message": f"Audio processing error: {str(e)}"
+            })
+
+    async def receiver(self):
+        """Read the socket until the client disconnects"""
+        while True:
+            # Text = JSON control/v1 audio, bytes = v2 audio
+            raw = await self.websocket.receive()
+            if raw["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(raw.get("code", 1000))
+
+            if raw.get("bytes") is not None:
+                await self.handle_binary(raw["bytes"])
+            else:
+                await self.handle_message(json.loads(raw["text"]))
+
+    # --- Lifecycle ---------------------------------------------------------
+
+    async def run(self):
+        """Run the session until the client disconnects"""
+        # Send initial connection message
+        self.send({
+            "type": "connection",
+            "status": "connected",
+            "model": self.model_key.size if self.model_key else None,
+            "compute_type": self.model_key.compute_type if self.model_key else None,
+            "device": whisper_service.device,
+            "protocols": [1, PROTOCOL_VERSION]
+        })
+
+        tasks = [
+            asyncio.create_task(self.sender()),
+            asyncio.create_task(self.inference()),
+        ]
+        try:
+            await self.receiver()
+        finally:
+            for task in tasks + list(self._background):
+                task.cancel()
+            await asyncio.gather(*tasks, *self._background, return_exceptions=True)
+            self.audio_processor.close()
+
+    def get_stats(self) -> dict:
+        """Queue depth and counters so lagging clients can be spotted"""
+        return {
+            "id": self.id,
+            "model": self.model_key._asdict() if self.model_key else None,
+            "protocol": self.protocol_version,
+            "streaming": self.streamer is not None,
+            "queue": self.queue.get_stats(),
+            "outbox_depth": self.outbox.qsize(),
+            "sent_messages": self.sent_messages,
+            "coalesced_messages": self.coalesced_messages,
+            "buffer": self.audio_processor.get_buffer_stats(),
+        }
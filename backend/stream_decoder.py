@@ -0,0 +1,136 @@
+"""Long-lived per-session decoder for compressed audio streams
+
+Browsers record WebM/Opus with MediaRecorder, and only the first chunk of a
+recording carries the container header. Decoding each chunk on its own spawns
+an ffmpeg process every 250 ms and fails on headerless fragments. Instead,
+one ffmpeg process per recording reads the compressed bytes from a pipe as
+they arrive and writes 16 kHz mono float32 PCM, which is handed to
+``on_audio`` as soon as it is decoded. Uploaded files use the same decoder
+with ``format=None``, letting ffmpeg detect the container.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Client format name -> ffmpeg demuxer
+DEMUXERS = {
+    "webm": "matroska",
+    "mkv": "matroska",
+    "ogg": "ogg",
+    "opus": "ogg",
+    "mp3": "mp3",
+    "aac": "aac",
+    "wav": "wav",
+    "flac": "flac",
+}
+
+READ_SIZE = 16384
+BYTES_PER_SAMPLE = 4  # float32
+
+
+class StreamDecoder:
+    """One ffmpeg process decoding a single compressed audio stream"""
+
+    def __init__(self, format: Optional[str], sample_rate: int, on_audio: Callable[[np.ndarray], Awaitable]):
+        if format is not None and format not in DEMUXERS:
+            raise ValueError(f"Unsupported streaming format: {format}")
+        self.format = format
+        self.sample_rate = sample_rate
+        self.on_audio = on_audio
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._stderr: Optional[asyncio.Task] = None
+        self._errors = deque(maxlen=5)
+        self.bytes_in = 0
+        self.samples_out = 0
+
+    async def start(self):
+        if self.format is not None:
+            # Start decoding as soon as the header is parsed instead of probing seconds of input
+            input_args = ["-probesize", "32", "-analyzeduration", "0", "-fflags", "nobuffer",
+                          "-f", DEMUXERS[self.format]]
+        else:
+            input_args = []
+        self.process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            *input_args, "-i", "pipe:0",
+            "-f", "f32le", "-ac", "1", "-ar", str(self.sample_rate), "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        self._reader = asyncio.create_task(self._read_output())
+        self._stderr = asyncio.create_task(self._read_errors())
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def _read_output(self):
+        """Forward decoded samples; a partial trailing sample waits for the next read"""
+        pending = b""
+        while True:
+            data = await self.process.stdout.read(READ_SIZE)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % BYTES_PER_SAMPLE
+            pending = data[usable:]
+            if usable:
+                samples = np.frombuffer(data[:usable], dtype=np.float32)
+                self.samples_out += len(samples)
+                await self.on_audio(samples)
+
+    async def _read_errors(self):
+        async for line in self.process.stderr:
+            message = line.decode(errors="replace").strip()
+            if message:
+                self._errors.append(message)
+                logger.warning(f"ffmpeg ({self.format or 'auto'}): {message}")
+
+    async def feed(self, data: bytes):
+        """Write compressed bytes; waits while ffmpeg's input pipe is full"""
+        if not self.running:
+            raise RuntimeError(f"Audio decoder exited: {'; '.join(self._errors) or 'unknown error'}")
+        self.process.stdin.write(data)
+        self.bytes_in += len(data)
+        try:
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            raise RuntimeError(f"Audio decoder exited: {'; '.join(self._errors) or 'broken pipe'}")
+
+    async def finish(self, timeout: Optional[float] = 5.0):
+        """End the input and wait until everything decoded has been delivered (None = no timeout)"""
+        if self.process is None:
+            return
+        if self.running and not self.process.stdin.is_closing():
+            self.process.stdin.close()
+        try:
+            await asyncio.wait_for(asyncio.gather(self._reader, self._stderr), timeout)
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"ffmpeg ({self.format or 'auto'}) did not finish in {timeout}s; killing it")
+            self.kill()
+
+    def kill(self):
+        """Stop immediately without delivering buffered output"""
+        for task in (self._reader, self._stderr):
+            if task is not None:
+                task.cancel()
+        if self.running:
+            self.process.kill()
+
+    def get_stats(self) -> dict:
+        return {
+            "format": self.format,
+            "running": self.running,
+            "bytes_in": self.bytes_in,
+            "decoded_ms": (self.samples_out / self.sample_rate) * 1000,
+            "errors": list(self._errors),
+        }
@@ -3,18 +3,26 @@
 import os
 import sys
 import asyncio
+import bisect
+import itertools
+import math
+import time
 import numpy as np
-from typing import Optional, AsyncGenerator, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, AsyncGenerator, Callable, Dict, NamedTuple, Tuple, List
 import logging
+import threading
+
+# Add parent directory to path to access existing code
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
 
 # Set up CUDA paths before imports
 def setup_cuda_paths():
     """Setup CUDA library paths before imports"""
     try:
-        # Add parent directory to path to access existing code
-        parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        sys.path.insert(0, parent_dir)
-        
         import nvidia.cublas.lib
         import nvidia.cudnn.lib
         
@@ -35,50 +43,705 @@ def setup_cuda_paths():
     except ImportError:
         return False
 
-# Setup CUDA before imports
-cuda_available = setup_cuda_paths()
+# The CUDA libraries and faster-whisper (ctranslate2, onnxruntime) take seconds
+# to import. import_runtime() loads them from the startup task, so the server
+# accepts connections and answers /health while they load.
+cuda_available = False
+WhisperModel = None
+BatchedInferencePipeline = None
+VadOptions = None
+get_speech_timestamps = None
+RUNTIME_TIMINGS: Dict[str, float] = {}
+_runtime_lock = threading.Lock()
 
-from faster_whisper import WhisperModel
+from metrics import (
+    AUDIO_SECONDS_TOTAL, BATCH_SIZE, BATCH_WAIT_SECONDS, INFERENCE_SECONDS,
+    MODEL_LOAD_SECONDS, REALTIME_FACTOR
+)
+from executors import ExecutorRegistry
+from replicas import CPU_REPLICAS, ReplicaPool
+from fake_model import FAKE_MODEL, FakeBatchedPipeline, FakeWhisperModel
+from quality import QualityController, QualityLevel
+from result_cache import ResultCache, cache_key
+from segments import segment_to_dict
+from src.env import env_flag
+from src.model_store import load_options, resolve_model
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def import_runtime() -> Dict[str, float]:
+    """Set up CUDA paths and import faster-whisper once; returns the import timings"""
+    global cuda_available, WhisperModel, BatchedInferencePipeline, VadOptions, get_speech_timestamps
+    with _runtime_lock:
+        if WhisperModel is not None:
+            return RUNTIME_TIMINGS
+        
+        started = time.monotonic()
+        cuda_available = setup_cuda_paths()
+        RUNTIME_TIMINGS["import:cuda"] = round(time.monotonic() - started, 3)
+        
+        started = time.monotonic()
+        from faster_whisper import WhisperModel as model_class
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        try:
+            from faster_whisper import BatchedInferencePipeline
+        except ImportError:  # faster-whisper < 1.1
+            BatchedInferencePipeline = None
+        WhisperModel = model_class
+        RUNTIME_TIMINGS["import:faster_whisper"] = round(time.monotonic() - started, 3)
+        
+        logger.info(f"Runtime imported (cuda={cuda_available}): {RUNTIME_TIMINGS}")
+        return RUNTIME_TIMINGS
+
+
+# Cross-session batching configuration
+BATCHING_ENABLED = env_flag("WHISPER_BATCHING", True)
+MAX_BATCH_SIZE = int(os.getenv("WHISPER_MAX_BATCH_SIZE", "8"))
+MAX_BATCH_WAIT_MS = float(os.getenv("WHISPER_MAX_BATCH_WAIT_MS", "50"))
+
+SAMPLE_RATE = 16000
+MAX_CLIP_SECONDS = 30  # Whisper's input window
+
+# Models loaded (and warmed up) at startup; the first becomes the default
+PRELOAD_MODELS = [m.strip() for m in os.getenv("WHISPER_PRELOAD_MODELS", "small").split(",") if m.strip()]
+WARMUP_ENABLED = env_flag("WHISPER_WARMUP", True)
+WARMUP_SECONDS = float(os.getenv("WHISPER_WARMUP_SECONDS", "5"))
+
+# Memory budget for all resident models; least recently used models are evicted beyond it
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("WHISPER_MODEL_MEMORY_MB", "4096"))
+
+# Model runtime settings; each (model, device, compute_type, cpu_threads, num_workers)
+# combination is loaded and pooled separately
+DEFAULT_COMPUTE_TYPES = {
+    "cuda": os.getenv("WHISPER_COMPUTE_TYPE_CUDA", "float16"),
+    "cpu": os.getenv("WHISPER_COMPUTE_TYPE_CPU", "float32"),
+}
+CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))  # 0 = CTranslate2 default
+NUM_WORKERS = int(os.getenv("WHISPER_NUM_WORKERS", "1"))
+# Upper bounds for client-chosen settings: every distinct value is a separately pooled model
+MAX_CPU_THREADS = os.cpu_count() or 1
+MAX_NUM_WORKERS = int(os.getenv("WHISPER_MAX_NUM_WORKERS", "4"))
+
+# Parameter counts (millions) used to estimate model memory
+MODEL_PARAMS_M = {
+    "tiny": 39,
+    "base": 74,
+    "small": 244,
+    "medium": 769,
+    "large-v2": 1550,
+    "large-v3": 1550,
+}
+
+BYTES_PER_PARAM = {
+    "float32": 4,
+    "float16": 2,
+    "bfloat16": 2,
+    "int8_float32": 1,
+    "int8_float16": 1,
+    "int8_bfloat16": 1,
+    "int8": 1,
+    "int16": 2,
+}
+COMPUTE_TYPES = tuple(BYTES_PER_PARAM)
+
+# GPU-only compute types and the CPU type used when falling back to CPU
+CPU_COMPUTE_TYPES = {
+    "float16": "float32",
+    "bfloat16": "float32",
+    "int8_float16": "int8",
+    "int8_bfloat16": "int8",
+}
+
+
+def bounded_setting(name: str, value, low: int, high: int) -> int:
+    """A client-supplied integer setting, rejected with ValueError outside ``[low, high]``"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {value!r}")
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+
+class ModelKey(NamedTuple):
+    """Everything that makes one loaded model different from another"""
+    size: str
+    device: str
+    compute_type: str
+    cpu_threads: int = 0
+    num_workers: int = 1
+
+
+class SpeedTracker:
+    """Measured inference speed per model key, kept across evictions"""
+
+    def __init__(self):
+        self._totals: Dict[ModelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: ModelKey, audio_seconds: float, elapsed: float):
+        with self._lock:
+            totals = self._totals.setdefault(key, [0.0, 0.0, 0])
+            totals[0] += audio_seconds
+            totals[1] += elapsed
+            totals[2] += 1
+
+    def totals(self) -> Dict[ModelKey, Tuple[float, float]]:
+        """Cumulative (audio seconds, inference seconds) per model key"""
+        with self._lock:
+            return {key: (totals[0], totals[1]) for key, totals in self._totals.items()}
+
+    def get_stats(self) -> List[dict]:
+        with self._lock:
+            items = [(key, list(totals)) for key, totals in self._totals.items()]
+        return [
+            {
+                **key._asdict(),
+                "calls": calls,
+                "audio_seconds": round(audio_seconds, 1),
+                "realtime_factor": round(elapsed / audio_seconds, 4) if audio_seconds else None,
+                "speed": round(audio_seconds / elapsed, 1) if elapsed else None,
+            }
+            for key, (audio_seconds, elapsed, calls) in items
+        ]
+
+
+MEASURED_SPEED = SpeedTracker()
+
+
+def record_inference(key: ModelKey, audio_samples: int, elapsed: float) -> Optional[float]:
+    """Update inference latency, real-time factor and audio throughput metrics
+
+    Returns the real-time factor (None for empty audio).
+    """
+    audio_seconds = audio_samples / SAMPLE_RATE
+    INFERENCE_SECONDS.labels(model=key.size).observe(elapsed)
+    AUDIO_SECONDS_TOTAL.labels(model=key.size).inc(audio_seconds)
+    if audio_seconds <= 0:
+        return None
+    realtime_factor = elapsed / audio_seconds
+    REALTIME_FACTOR.labels(model=key.size, compute_type=key.compute_type).observe(realtime_factor)
+    MEASURED_SPEED.record(key, audio_seconds, elapsed)
+    return realtime_factor
+
+
+def warmup_audio(seconds: float = WARMUP_SECONDS) -> np.ndarray:
+    """Deterministic speech-like signal: harmonics under a syllable-rate envelope plus noise
+
+    Silence would be skipped by VAD and never reach the decoder, so warmup
+    uses a voiced signal that exercises the encoder, beam search and allocator.
+    """
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    noise = np.random.default_rng(0).normal(0, 0.01, len(t))
+    return (0.2 * voice * envelope + noise).astype(np.float32)
+
+
+def estimate_model_memory_mb(model_size: str, compute_type: str) -> float:
+    """Rough resident size of a model (weights plus ~20% runtime overhead)"""
+    params = MODEL_PARAMS_M.get(model_size, 1550)
+    return params * BYTES_PER_PARAM.get(compute_type, 4) * 1.2
+
+
+@dataclass(eq=False)
+class ModelHandle:
+    """A loaded model and its batched pipeline (or its worker processes)"""
+    size: str
+    device: str
+    compute_type: str
+    cpu_threads: int
+    num_workers: int
+    model: Optional["WhisperModel"]
+    batched_model: Optional["BatchedInferencePipeline"]
+    memory_mb: float
+    load_seconds: float
+    replicas: Optional[ReplicaPool] = None
+    # Distinguishes successive loads of the same key
+    version: int = 0
+    # Requests currently using the model; a retired handle is released at zero
+    active: int = 0
+    retired: bool = False
+
+    @property
+    def key(self) -> ModelKey:
+        return ModelKey(self.size, self.device, self.compute_type, self.cpu_threads, self.num_workers)
+
+
+class ModelPool:
+    """Resident models keyed by ModelKey with LRU eviction
+
+    Evicted models leave the pool at once, so new requests never pick them
+    up, but are only released after the requests already using them (see
+    ``lease``) have finished.
+    """
+    
+    def __init__(self, memory_budget_mb: float = MODEL_MEMORY_BUDGET_MB):
+        self.memory_budget_mb = memory_budget_mb
+        self.models: "OrderedDict[ModelKey, ModelHandle]" = OrderedDict()
+        # Retired handles still finishing in-flight requests
+        self.draining: List[ModelHandle] = []
+        # Worker-process shutdowns of released models, running in threads
+        self._stopping = set()
+        self.pinned = set()
+        self._versions = itertools.count(1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced_loads = 0
+    
+    def get(self, key: ModelKey) -> Optional[ModelHandle]:
+        """Return a resident model and mark it most recently used"""
+        handle = self.models.get(key)
+        if handle is not None:
+            self.models.move_to_end(key)
+            self.hits += 1
+        return handle
+    
+    def used_mb(self) -> float:
+        return sum(h.memory_mb for h in self.models.values()) + sum(h.memory_mb for h in self.draining)
+    
+    @contextmanager
+    def lease(self, handle: ModelHandle):
+        """Keep ``handle`` alive while a request uses it (event loop only)"""
+        handle.active += 1
+        try:
+            yield handle
+        finally:
+            handle.active -= 1
+            if handle.retired and handle.active == 0:
+                self._release(handle)
+    
+    def _release(self, handle: ModelHandle):
+        if handle in self.draining:
+            self.draining.remove(handle)
+        if handle.replicas is not None:
+            self._stop_replicas(handle.replicas)
+        # Drop our references so the weights are freed with the last in-flight result
+        handle.model = None
+        handle.batched_model = None
+        logger.info(f"Released model {handle.size} v{handle.version} ({handle.device}/{handle.compute_type})")
+    
+    def _stop_replicas(self, replicas: ReplicaPool):
+        """Join a released model's worker processes off the event loop (up to seconds each)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            replicas.stop()
+            return
+        task = loop.create_task(asyncio.to_thread(replicas.stop))
+        self._stopping.add(task)
+        task.add_done_callback(self._stopping.discard)
+    
+    def retire(self, handle: ModelHandle):
+        """Remove a model from the pool; release it once its in-flight requests finish"""
+        if self.models.get(handle.key) is handle:
+            del self.models[handle.key]
+        handle.retired = True
+        if handle.active:
+            logger.info(f"Draining model {handle.size} v{handle.version}: {handle.active} requests in flight")
+            self.draining.append(handle)
+        else:
+            self._release(handle)
+    
+    def make_room(self, needed_mb: float):
+        """Evict least recently used, unpinned models until ``needed_mb`` fits the budget"""
+        for key in list(self.models):
+            if self.used_mb() + needed_mb <= self.memory_budget_mb:
+                break
+            if key in self.pinned:
+                continue
+            handle = self.models[key]
+            self.retire(handle)
+            self.evictions += 1
+            logger.info(f"Evicted model {handle.size} ({handle.device}/{handle.compute_type}) from pool")
+    
+    def add(self, handle: ModelHandle):
+        """Make ``handle`` the model served for its key (replacing any older version)"""
+        handle.version = next(self._versions)
+        previous = self.models.get(handle.key)
+        if previous is not None:
+            self.retire(previous)
+        self.make_room(handle.memory_mb)
+        # A single assignment: requests see either the old version or the new one
+        self.models[handle.key] = handle
+        self.misses += 1
+    
+    def shutdown(self):
+        for handle in list(self.models.values()) + self.draining:
+            if handle.replicas is not None:
+                handle.replicas.stop()
+    
+    def get_stats(self) -> dict:
+        return {
+            "memory_budget_mb": self.memory_budget_mb,
+            "memory_used_mb": round(self.used_mb(), 1),
+            "loaded": [
+                {
+                    "model": h.size,
+                    "device": h.device,
+                    "compute_type": h.compute_type,
+                    "cpu_threads": h.cpu_threads,
+                    "num_workers": h.num_workers,
+                    "memory_mb": round(h.memory_mb, 1),
+                    "load_seconds": round(h.load_seconds, 2),
+                    "version": h.version,
+                    "active": h.active
+                }
+                for h in self.models.values()
+            ],
+            "draining": [
+                {"model": h.size, "version": h.version, "active": h.active}
+                for h in self.draining
+            ],
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced_loads": self.coalesced_loads,
+        }
+
+
+@dataclass
+class TranscriptionRequest:
+    """A chunk of audio waiting for the batch scheduler"""
+    handle: ModelHandle
+    audio: np.ndarray
+    language: str
+    word_timestamps: bool
+    level: QualityLevel
+    future: asyncio.Future
+    # Called from the inference worker with each segment as it is decoded
+    on_segment: Optional[Callable[[dict], None]] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class BatchScheduler:
+    """Collects ready chunks from all sessions and decodes them as one batch
+
+    A batch is closed when it reaches ``max_batch_size`` or when the oldest
+    request has waited ``max_wait_ms``. Requests for different models,
+    languages, word-timestamp settings or quality levels are decoded in
+    separate batches.
+    """
+    
+    def __init__(self, service: "WhisperService", max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_BATCH_WAIT_MS):
+        self.service = service
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._inflight_limit = 0
+        self.batch_size_histogram = BATCH_SIZE.labels()
+        self.wait_time_histogram = BATCH_WAIT_SECONDS.labels()
+    
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self.queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def submit(self, handle: ModelHandle, audio: np.ndarray, language: str,
+                     word_timestamps: bool, level: QualityLevel,
+                     on_segment: Optional[Callable[[dict], None]] = None) -> List[dict]:
+        """Queue audio for the next batch and wait for its segments"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(TranscriptionRequest(handle, audio, language, word_timestamps, level, future, on_segment))
+        return await future
+    
+    async def _collect_batch(self) -> List[TranscriptionRequest]:
+        """Wait for one request, then gather more until the batch is full or the deadline passes"""
+        first = await self.queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                # Still take whatever is already queued without waiting
+                if self.queue.empty():
+                    break
+                batch.append(self.queue.get_nowait())
+                continue
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run(self):
+        while True:
+            # Only close a batch when a worker can take it; meanwhile requests keep queueing
+            slots = self._slots()
+            await slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                slots.release()
+                raise
+            task = asyncio.get_running_loop().create_task(self._execute(batch))
+            task.add_done_callback(lambda _: slots.release())
+    
+    def _slots(self) -> asyncio.Semaphore:
+        """In-flight batch limit matching the inference pool size"""
+        workers = self.service.executors.inference(self.service.device).max_workers
+        if self._inflight is None or self._inflight_limit != workers:
+            self._inflight = asyncio.Semaphore(workers)
+            self._inflight_limit = workers
+        return self._inflight
+    
+    async def _execute(self, batch: List[TranscriptionRequest]):
+        started = time.monotonic()
+        for request in batch:
+            self.wait_time_histogram.observe(started - request.enqueued_at)
+        
+        groups = {}
+        for request in batch:
+            key = (request.handle.key, request.handle.version, request.language, request.word_timestamps, request.level)
+            groups.setdefault(key, []).append(request)
+        
+        for (_, _, language, word_timestamps, level), requests in groups.items():
+            self.batch_size_histogram.observe(len(requests))
+            handle = requests[0].handle
+            try:
+                results = await self.service.executors.inference(handle.device).run(
+                    self.service._transcribe_batch,
+                    handle,
+                    [r.audio for r in requests],
+                    language,
+                    word_timestamps,
+                    level,
+                    [r.on_segment for r in requests]
+                )
+            except Exception as e:
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            for request, segments in zip(requests, results):
+                if not request.future.done():
+                    request.future.set_result(segments)
+    
+    def get_stats(self) -> dict:
+        """Batch size and queue wait histograms"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "wait_time_seconds": self.wait_time_histogram.snapshot(),
+        }
+
 class WhisperService:
     """Service for managing Whisper model and transcription"""
     
     def __init__(self):
-        self.model = None
-        self.current_model_size = None
-        self.device = "cuda" if cuda_available else "cpu"
+        self.pool = ModelPool()
+        # Loads in progress, shared by every request for the same key
+        self._loading: Dict[ModelKey, asyncio.Task] = {}
+        self.executors = ExecutorRegistry()
+        self.default_key: Optional[ModelKey] = None
+        self.scheduler = BatchScheduler(self) if BATCHING_ENABLED else None
+        self.quality = QualityController(self.inference_backlog)
+        self.cache = ResultCache()
+        # Startup state for /health and /ready
+        self.ready = False
+        self.startup_phase = "starting"
+        self.startup_error: Optional[str] = None
+        self.startup_timings: Dict[str, float] = {}
+        self.preloaded = set()
+        # Known once the runtime is imported
+        self.device: Optional[str] = None
+        self.compute_types = dict(DEFAULT_COMPUTE_TYPES)
+        self.cpu_threads = CPU_THREADS
+        self.num_workers = NUM_WORKERS
         self.models_info = {
-            "tiny": {"size": "39 MB", "speed": 5, "accuracy": 2},
-            "base": {"size": "74 MB", "speed": 4, "accuracy": 3},
-            "small": {"size": "244 MB", "speed": 3, "accuracy": 4},
-            "medium": {"size": "769 MB", "speed": 2, "accuracy": 5}
+            "tiny": {"size": "39 MB", "accuracy": 2},
+            "base": {"size": "74 MB", "accuracy": 3},
+            "small": {"size": "244 MB", "accuracy": 4},
+            "medium": {"size": "769 MB", "accuracy": 5}
         }
     
-    async def load_model(self, model_size: str = "small") -> bool:
-        """Load or switch Whisper model"""
-        if self.current_model_size == model_size and self.model is not None:
-            logger.info(f"Model {model_size} already loaded")
-            return True
+    @property
+    def compute_type(self) -> Optional[str]:
+        """Configured compute type for the current device"""
+        return self.compute_types.get(self.device)
+    
+    @property
+    def current_model_size(self) -> Optional[str]:
+        return self.default_key.size if self.default_key else None
+    
+    @property
+    def model(self):
+        """The default model (used by sessions that did not pick one)"""
+        handle = self.pool.models.get(self.default_key)
+        return handle.model if handle else None
+    
+    @property
+    def model_loaded(self) -> bool:
+        """Whether the default model is resident (in-process or as replicas)"""
+        return self.default_key in self.pool.models
+    
+    def inference_workers(self, device: str) -> int:
+        """Inference slots on a device: its worker processes, or else its inference pool"""
+        replicas = sum(h.replicas.size for h in self.pool.models.values()
+                       if h.replicas is not None and h.device == device)
+        return replicas or self.executors.inference(device).max_workers
+    
+    def inference_backlog(self) -> float:
+        """Inference calls waiting per worker (scheduler, executor and replica queues)"""
+        if self.device is None:
+            # Still starting up: no inference pool yet
+            return 0.0
+        executor = self.executors.inference(self.device)
+        waiting = executor.queued
+        if self.scheduler is not None and self.scheduler.queue is not None:
+            # Queued requests are decoded max_batch_size at a time; count the batches they make
+            waiting += math.ceil(self.scheduler.queue.qsize() / self.scheduler.max_batch_size)
+        workers = executor.max_workers
+        for handle in self.pool.models.values():
+            if handle.replicas is not None:
+                stats = handle.replicas.get_stats()["replicas"]
+                waiting += sum(max(0, r["pending"] - 1) for r in stats)
+                workers += len(stats)
+        return waiting / workers
+    
+    def _record_inference(self, handle: ModelHandle, audio_samples: int, elapsed: float):
+        realtime_factor = record_inference(handle.key, audio_samples, elapsed)
+        if realtime_factor is not None:
+            self.quality.observe(realtime_factor)
+    
+    def model_key(self, model_size: str, compute_type: Optional[str] = None,
+                  cpu_threads: Optional[int] = None, num_workers: Optional[int] = None) -> ModelKey:
+        """Fill unset settings from the configured defaults for the current device"""
+        if self.device is None:
+            raise ValueError("Server is still starting up")
+        compute_type = compute_type or self.compute_type
+        if compute_type not in COMPUTE_TYPES:
+            raise ValueError(f"Invalid compute_type: {compute_type}")
+        if self.device == "cpu":
+            compute_type = CPU_COMPUTE_TYPES.get(compute_type, compute_type)
+        cpu_threads = (self.cpu_threads if cpu_threads is None
+                       else bounded_setting("cpu_threads", cpu_threads, 0, MAX_CPU_THREADS))
+        num_workers = (self.num_workers if num_workers is None
+                       else bounded_setting("num_workers", num_workers, 1, MAX_NUM_WORKERS))
+        if self.device == "cpu" and CPU_REPLICAS > 0 and not FAKE_MODEL:
+            # Worker processes decode one request each; num_workers would only split the pool
+            num_workers = 1
+        return ModelKey(
+            size=model_size,
+            device=self.device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers
+        )
+    
+    async def get_model(self, key: Optional[ModelKey] = None) -> ModelHandle:
+        """Return a pooled model, loading it (and evicting LRU models) if needed"""
+        key = key or self.default_key
+        if key is None:
+            raise ValueError("Model not loaded" if self.ready else "Model is still loading")
         
-        try:
-            logger.info(f"Loading {model_size} model on {self.device}")
-            
-            # Load in separate thread to not block
-            loop = asyncio.get_event_loop()
-            self.model = await loop.run_in_executor(
-                None, 
-                lambda: WhisperModel(
-                    model_size, 
-                    device=self.device, 
-                    compute_type="float16" if self.device == "cuda" else "float32"
-                )
+        handle = self.pool.get(key)
+        if handle is not None:
+            return handle
+        
+        # Concurrent requests for a model that is not resident wait for one load
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._load(key))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        else:
+            self.pool.coalesced_loads += 1
+        # Shielded: a caller giving up (e.g. a disconnect) must not abort the shared load
+        return await asyncio.shield(task)
+    
+    async def _load(self, key: ModelKey) -> ModelHandle:
+        """Load a model next to the resident ones and add it to the pool"""
+        model_size, device, compute_type, cpu_threads, num_workers = key
+        logger.info(
+            f"Loading {model_size} model on {device} "
+            f"(compute_type={compute_type}, cpu_threads={cpu_threads or 'auto'}, num_workers={num_workers})"
+        )
+        started = time.monotonic()
+        
+        if device == "cpu" and CPU_REPLICAS > 0 and not FAKE_MODEL:
+            # Serve this model from worker processes instead of in-process; each worker
+            # decodes one request at a time, so num_workers does not apply
+            replicas = ReplicaPool(model_size, compute_type, CPU_REPLICAS, cpu_threads or None)
+            await self.executors.loading.run(replicas.start)
+            handle = ModelHandle(
+                size=model_size,
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                num_workers=num_workers,
+                model=None,
+                batched_model=None,
+                memory_mb=estimate_model_memory_mb(model_size, compute_type) * replicas.size,
+                load_seconds=time.monotonic() - started,
+                replicas=replicas
+            )
+            self.pool.add(handle)
+            MODEL_LOAD_SECONDS.labels(model=model_size, device=device, compute_type=compute_type).set(handle.load_seconds)
+            return handle
+        
+        # Load on the model-loading pool so live transcription keeps its workers
+        if FAKE_MODEL:
+            model_class, model_path, options = FakeWhisperModel, model_size, {}
+        else:
+            # Prefer the local model store; fall back to the hub cache
+            model_class = WhisperModel
+            model_path = resolve_model(model_size, compute_type)
+            options = load_options(model_path)
+            logger.info(f"Loading {model_size} from {model_path}")
+        model = await self.executors.loading.run(
+            lambda: model_class(
+                model_path, 
+                device=device, 
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                num_workers=num_workers,
+                **options
             )
+        )
+        
+        handle = ModelHandle(
+            size=model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+            model=model,
+            batched_model=(
+                FakeBatchedPipeline(model=model) if FAKE_MODEL
+                else BatchedInferencePipeline(model=model) if BatchedInferencePipeline else None
+            ),
+            memory_mb=estimate_model_memory_mb(model_size, compute_type),
+            load_seconds=time.monotonic() - started
+        )
+        self.pool.add(handle)
+        MODEL_LOAD_SECONDS.labels(model=model_size, device=device, compute_type=compute_type).set(handle.load_seconds)
+        logger.info(f"✓ Model {model_size} loaded successfully on {device} in {handle.load_seconds:.1f}s")
+        return handle
+    
+    async def load_model(self, model_size: str = "small", compute_type: Optional[str] = None,
+                         cpu_threads: Optional[int] = None, num_workers: Optional[int] = None) -> bool:
+        """Load a model and make it the default for new sessions"""
+        try:
+            handle = await self.get_model(self.model_key(model_size, compute_type, cpu_threads, num_workers))
             
-            self.current_model_size = model_size
-            logger.info(f"✓ Model {model_size} loaded successfully on {self.device}")
+            # Keep the default (and preloaded models) resident; others are evictable
+            if self.default_key not in self.preloaded:
+                self.pool.pinned.discard(self.default_key)
+            self.pool.pinned.add(handle.key)
+            self.default_key = handle.key
             return True
             
         except Exception as e:
@@ -86,37 +749,294 @@ class WhisperService:
             # Try CPU fallback
             if self.device == "cuda":
                 self.device = "cpu"
-                return await self.load_model(model_size)
+                return await self.load_model(model_size, compute_type, cpu_threads, num_workers)
             return False
     
-    async def transcribe_audio(self, audio_data: np.ndarray, language: str = "en") -> AsyncGenerator[dict, None]:
-        """Transcribe audio and yield results"""
-        if self.model is None:
-            raise ValueError("Model not loaded")
-        
+    def _warmup(self, handle: ModelHandle, audio: np.ndarray):
+        """Run a throwaway decode through every code path the handle serves (worker thread)"""
+        segments, _ = handle.model.transcribe(audio, language="en", beam_size=5, vad_filter=False)
+        list(segments)
+        if handle.batched_model is not None:
+            segments, _ = handle.batched_model.transcribe(
+                audio, language="en", beam_size=5, vad_filter=False,
+                clip_timestamps=[{"start": 0, "end": len(audio)}], batch_size=1
+            )
+            list(segments)
+    
+    async def warmup(self, handle: ModelHandle):
+        """Pay CUDA/cuBLAS initialization and allocator growth before real traffic"""
+        if handle.retired:
+            # Evicted while the preload list was loading; nothing left to warm up
+            return
+        audio = warmup_audio()
+        with self.pool.lease(handle):
+            if handle.replicas is not None:
+                # One request per worker process
+                await asyncio.gather(*(
+                    handle.replicas.transcribe(audio, dict(language="en", beam_size=5, vad_filter=False))
+                    for _ in range(handle.replicas.size)
+                ))
+            else:
+                await self.executors.inference(handle.device).run(self._warmup, handle, audio)
+    
+    def _phase(self, name: str, started: float):
+        elapsed = time.monotonic() - started
+        self.startup_timings[name] = round(elapsed, 3)
+        logger.info(f"Startup phase {name}: {elapsed:.2f}s")
+    
+    async def startup(self, models: Optional[List[str]] = None, warmup: bool = WARMUP_ENABLED) -> bool:
+        """Import the runtime, load and warm up the preload list, then mark the service ready
+
+        The first model becomes the default. Returns False (and stays not
+        ready) if the runtime cannot be imported or the default model cannot
+        be loaded.
+        """
+        models = models or PRELOAD_MODELS
+        started = time.monotonic()
         try:
-            # Run transcription in executor to not block
-            loop = asyncio.get_event_loop()
-            segments, info = await loop.run_in_executor(
-                None,
-                lambda: self.model.transcribe(
+            self.startup_phase = "importing runtime"
+            # Off the event loop, so /health keeps answering during the import
+            self.startup_timings.update(await asyncio.to_thread(import_runtime))
+            self.device = "cuda" if cuda_available else "cpu"
+        except Exception as e:
+            self.startup_phase = "failed"
+            self.startup_error = f"Runtime import failed: {e}"
+            logger.error(self.startup_error)
+            return False
+        
+        for index, model_size in enumerate(models):
+            try:
+                self.startup_phase = f"loading {model_size}"
+                phase_started = time.monotonic()
+                if index == 0:
+                    if not await self.load_model(model_size):
+                        raise RuntimeError(f"Failed to load default model {model_size}")
+                    handle = self.pool.get(self.default_key)
+                else:
+                    handle = await self.get_model(self.model_key(model_size))
+                self.preloaded.add(handle.key)
+                self.pool.pinned.add(handle.key)
+                self._phase(f"load:{model_size}", phase_started)
+                
+                if warmup:
+                    self.startup_phase = f"warming up {model_size}"
+                    phase_started = time.monotonic()
+                    await self.warmup(handle)
+                    self._phase(f"warmup:{model_size}", phase_started)
+            except Exception as e:
+                if index > 0:
+                    # Extra models are optional: serve without them
+                    logger.error(f"Skipping preload of {model_size}: {e}")
+                    continue
+                self.startup_phase = "failed"
+                self.startup_error = str(e)
+                logger.error(f"Startup failed: {e}")
+                return False
+        
+        self._phase("total", started)
+        self.startup_phase = "ready"
+        self.ready = True
+        return True
+    
+    def _transcribe_batch(self, handle: ModelHandle, audios: List[np.ndarray], language: str,
+                          word_timestamps: bool, level: QualityLevel,
+                          callbacks: Optional[List[Optional[Callable[[dict], None]]]] = None) -> List[List[dict]]:
+        """Decode several independent chunks in one batched model call (runs in a worker thread)
+
+        The chunks are concatenated and their speech regions are passed as clip
+        timestamps, so the batched pipeline decodes every region independently.
+        Segments are then routed back to their chunk by start time, and handed
+        to the chunk's callback as soon as they are decoded.
+        """
+        callbacks = callbacks or [None] * len(audios)
+        if handle.batched_model is None or len(audios) == 1:
+            return [
+                self._transcribe_single(handle, audio, language, word_timestamps, level, on_segment)
+                for audio, on_segment in zip(audios, callbacks)
+            ]
+        
+        clip_starts = []
+        clip_owner = []
+        clips = []
+        offsets = []
+        offset = 0
+        vad_options = VadOptions(min_silence_duration_ms=500)
+        max_clip = MAX_CLIP_SECONDS * SAMPLE_RATE
+        for index, audio in enumerate(audios):
+            offsets.append(offset / SAMPLE_RATE)
+            for region in get_speech_timestamps(audio, vad_options):
+                start = region["start"]
+                while start < region["end"]:
+                    end = min(region["end"], start + max_clip)
+                    # The pipeline slices the audio with sample indices; segments come back in seconds
+                    clip_starts.append((offset + start) / SAMPLE_RATE)
+                    clip_owner.append(index)
+                    clips.append({"start": offset + start, "end": offset + end})
+                    start = end
+            offset += len(audio)
+        
+        results = [[] for _ in audios]
+        if not clips:
+            return results
+        
+        started = time.monotonic()
+        segments, _ = handle.batched_model.transcribe(
+            np.concatenate(audios),
+            language=language,
+            vad_filter=False,
+            clip_timestamps=clips,
+            word_timestamps=word_timestamps,
+            batch_size=min(len(clips), self.scheduler.max_batch_size if self.scheduler else len(clips)),
+            **level.decode_options()
+        )
+        for segment in segments:
+            clip = max(bisect.bisect_right(clip_starts, segment.start + 1e-3) - 1, 0)
+            owner = clip_owner[clip]
+            result = segment_to_dict(segment, offsets[owner])
+            results[owner].append(result)
+            if callbacks[owner] is not None:
+                callbacks[owner](result)
+        self._record_inference(handle, offset, time.monotonic() - started)
+        return results
+    
+    def _transcribe_single(self, handle: ModelHandle, audio_data: np.ndarray, language: str,
+                           word_timestamps: bool, level: QualityLevel,
+                           on_segment: Optional[Callable[[dict], None]] = None) -> List[dict]:
+        """Decode one chunk with the sequential pipeline (runs in a worker thread)"""
+        started = time.monotonic()
+        segments, info = handle.model.transcribe(
+            audio_data,
+            language=language,
+            word_timestamps=word_timestamps,
+            vad_filter=True,
+            vad_parameters=dict(min_silence_duration_ms=500),
+            **level.decode_options()
+        )
+        # Segments are generated lazily, so decoding happens here, in the worker thread
+        results = []
+        for segment in segments:
+            result = segment_to_dict(segment)
+            results.append(result)
+            if on_segment is not None:
+                on_segment(result)
+        self._record_inference(handle, len(audio_data), time.monotonic() - started)
+        return results
+    
+    async def _transcribe(self, audio_data: np.ndarray, language: str,
+                          word_timestamps: bool = False,
+                          model: Optional[ModelKey] = None,
+                          on_segment: Optional[Callable[[dict], None]] = None) -> List[dict]:
+        """Transcribe one chunk; ``on_segment`` (if given) receives in-process decodes segment by segment
+
+        ``on_segment`` is called from the inference worker thread with a copy
+        of each segment. Cache hits and worker-process results are only returned.
+        """
+        while True:
+            handle = await self.get_model(model)
+            # get_model resumes after its load finished; another load may have evicted the model since
+            if not handle.retired:
+                break
+        # Taken before the next await and held until the result is stored, so a model
+        # swapped out meanwhile is not released under us
+        with self.pool.lease(handle):
+            # Cheaper decoding settings while the server is behind
+            level = self.quality.update()
+            
+            emit = (lambda result: on_segment({**result, "quality": level.name})) if on_segment else None
+            
+            key = None
+            if self.cache.enabled:
+                key = cache_key(
                     audio_data,
-                    beam_size=5,
+                    model=handle.size,
+                    device=handle.device,
+                    compute_type=handle.compute_type,
                     language=language,
-                    vad_filter=True,
-                    vad_parameters=dict(min_silence_duration_ms=500)
+                    word_timestamps=word_timestamps,
+                    decode=level.decode_options()
                 )
-            )
+                # Only the disk tier does I/O; memory lookups stay on the loop
+                cached = (await asyncio.to_thread(self.cache.get, key) if self.cache.directory
+                          else self.cache.get(key))
+                if cached is not None:
+                    for result in cached:
+                        result["cached"] = True
+                        # Levels with the same decoding options share entries; label with this one
+                        result["quality"] = level.name
+                    return cached
             
-            # Yield segments as they come
-            for segment in segments:
-                yield {
-                    "type": "transcription",
-                    "text": segment.text.strip(),
-                    "start": segment.start,
-                    "end": segment.end,
-                    "final": True
-                }
+            if handle.replicas is not None:
+                # Worker processes decode one request each; no in-process batching
+                started = time.monotonic()
+                results = await handle.replicas.transcribe(audio_data, dict(
+                    language=language,
+                    word_timestamps=word_timestamps,
+                    vad_filter=True,
+                    vad_parameters=dict(min_silence_duration_ms=500),
+                    **level.decode_options()
+                ))
+                self._record_inference(handle, len(audio_data), time.monotonic() - started)
+            elif self.scheduler is not None:
+                # Share a batched model call with other sessions
+                results = await self.scheduler.submit(handle, audio_data, language, word_timestamps, level, emit)
+            else:
+                # Run transcription on the device's inference pool
+                results = await self.executors.inference(handle.device).run(
+                    self._transcribe_single, handle, audio_data, language, word_timestamps, level, emit
+                )
+            for result in results:
+                result["quality"] = level.name
+            if key is not None:
+                if self.cache.directory:
+                    await asyncio.to_thread(self.cache.put, key, results)
+                else:
+                    self.cache.put(key, results)
+            return results
+    
+    async def transcribe(self, audio_data: np.ndarray, language: str = "en", word_timestamps: bool = False,
+                         model: Optional[ModelKey] = None) -> List[dict]:
+        """Transcribe audio and return its segments; errors are raised, not yielded"""
+        return await self._transcribe(audio_data, language, word_timestamps, model)
+    
+    async def transcribe_words(self, audio_data: np.ndarray, language: str = "en",
+                               model: Optional[ModelKey] = None) -> List[Tuple[float, float, str]]:
+        """Transcribe audio and return (start, end, word) tuples relative to the audio start"""
+        results = await self._transcribe(audio_data, language, word_timestamps=True, model=model)
+        return [word for result in results for word in result.get("words", [])]
+    
+    async def transcribe_audio(self, audio_data: np.ndarray, language: str = "en",
+                               model: Optional[ModelKey] = None) -> AsyncGenerator[dict, None]:
+        """Transcribe audio with the session's model (default model if None), yielding segments as they decode
+
+        The worker thread consumes faster-whisper's lazy segment generator and
+        hands each segment to the event loop through a queue, so a long chunk
+        produces its first results early and never blocks other sessions.
+        """
+        loop = asyncio.get_running_loop()
+        decoded: asyncio.Queue = asyncio.Queue()
+        
+        def on_segment(result: dict):
+            loop.call_soon_threadsafe(decoded.put_nowait, result)
+        
+        task = asyncio.create_task(self._transcribe(audio_data, language, model=model, on_segment=on_segment))
+        try:
+            streamed = 0
+            while not task.done():
+                next_segment = asyncio.ensure_future(decoded.get())
+                await asyncio.wait((next_segment, task), return_when=asyncio.FIRST_COMPLETED)
+                if not next_segment.done():
+                    next_segment.cancel()
+                    break
+                streamed += 1
+                yield next_segment.result()
+            results = task.result()
+            # Segments handed over just before the decode finished
+            while not decoded.empty():
+                streamed += 1
+                yield decoded.get_nowait()
+            # Cache hits and worker-process results arrive all at once
+            for result in results[streamed:]:
+                yield result
                 
         except Exception as e:
             logger.error(f"Transcription error: {e}")
@@ -124,6 +1044,26 @@ class WhisperService:
                 "type": "error",
                 "message": str(e)
             }
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    def get_stats(self) -> dict:
+        """Scheduler statistics for tuning"""
+        return {
+            "batching": self.scheduler.get_stats() if self.scheduler else None,
+            "batched_pipeline": BatchedInferencePipeline is not None,
+            "quality": self.quality.get_stats(),
+            "result_cache": self.cache.get_stats(),
+            "model_pool": self.pool.get_stats(),
+            "executors": self.executors.get_stats(),
+            "replicas": [h.replicas.get_stats() for h in self.pool.models.values() if h.replicas]
+        }
+    
+    def shutdown(self):
+        """Stop worker processes and thread pools"""
+        self.pool.shutdown()
+        self.executors.shutdown()
     
     def get_model_info(self):
         """Get information about available models"""
@@ -132,6 +1072,15 @@ class WhisperService:
             "current_model": self.current_model_size,
             "device": self.device,
             "cuda_available": cuda_available,
+            "settings": self.default_key._asdict() if self.default_key else None,
+            "defaults": {
+                "compute_types": self.compute_types,
+                "cpu_threads": self.cpu_threads,
+                "num_workers": self.num_workers
+            },
+            "compute_types": list(COMPUTE_TYPES),
+            "loaded_models": [h.key._asdict() for h in self.pool.models.values()],
+            "measured_speed": MEASURED_SPEED.get_stats(),
             "models_info": self.models_info
         }
 
@@ -1,4 +1,4 @@
-import React, { useEffect } from 'react';
+import React, { useEffect, useRef } from 'react';
 import ModelSelector from './components/ModelSelector';
 import RecordButton from './components/RecordButton';
 import TranscriptionBox from './components/TranscriptionBox';
@@ -15,6 +15,7 @@ function App() {
     modelLoading,
     sendAudio,
     changeModel,
+    flush,
     clearTranscriptions
   } = useWebSocket();
 
@@ -24,6 +25,15 @@ function App() {
     toggleRecording
   } = useAudioRecorderPCM(sendAudio);
 
+  // Commit any pending partial text when recording stops
+  const wasRecording = useRef(false);
+  useEffect(() => {
+    if (wasRecording.current && !isRecording) {
+      flush();
+    }
+    wasRecording.current = isRecording;
+  }, [isRecording, flush]);
+
   // Keyboard shortcut for recording (spacebar)
   useEffect(() => {
     const handleKeyPress = (e) => {
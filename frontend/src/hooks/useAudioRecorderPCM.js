@@ -12,38 +12,20 @@ export const useAudioRecorderPCM = (onDataAvailable) => {
   const sendInterval = useRef(null);
   const audioBuffer = useRef([]);
 
-  // Convert Float32Array to base64
-  const float32ToBase64 = (float32Array) => {
-    const buffer = new ArrayBuffer(float32Array.length * 4);
-    const view = new Float32Array(buffer);
-    view.set(float32Array);
-    
-    // Convert ArrayBuffer to base64
-    const bytes = new Uint8Array(buffer);
-    let binary = '';
-    for (let i = 0; i < bytes.byteLength; i++) {
-      binary += String.fromCharCode(bytes[i]);
-    }
-    return btoa(binary);
-  };
-
   const startRecording = useCallback(async () => {
     try {
       // Request microphone access
       stream.current = await navigator.mediaDevices.getUserMedia({ 
         audio: {
           channelCount: 1,
-          sampleRate: 16000,
           echoCancellation: true,
           noiseSuppression: true,
           autoGainControl: true
         } 
       });
 
-      // Create audio context with specific sample rate
-      audioContext.current = new (window.AudioContext || window.webkitAudioContext)({
-        sampleRate: 16000
-      });
+      // Capture at the hardware rate; the backend resamples to 16kHz
+      audioContext.current = new (window.AudioContext || window.webkitAudioContext)();
 
       // Create source from stream
       source.current = audioContext.current.createMediaStreamSource(stream.current);
@@ -69,9 +51,8 @@ export const useAudioRecorderPCM = (onDataAvailable) => {
           const audioData = new Float32Array(audioBuffer.current);
           audioBuffer.current = []; // Clear buffer
           
-          // Convert to base64 and send
-          const base64Audio = float32ToBase64(audioData);
-          onDataAvailable(base64Audio, 'pcm');
+          // Hand raw samples to the socket (binary frame or base64 fallback)
+          onDataAvailable(audioData, 'pcm', audioContext.current.sampleRate);
         }
       }, 250);
 
@@ -95,8 +76,7 @@ export const useAudioRecorderPCM = (onDataAvailable) => {
       // Send any remaining audio
       if (audioBuffer.current.length > 0) {
         const audioData = new Float32Array(audioBuffer.current);
-        const base64Audio = float32ToBase64(audioData);
-        onDataAvailable(base64Audio, 'pcm');
+        onDataAvailable(audioData, 'pcm', audioContext.current.sampleRate);
         audioBuffer.current = [];
       }
 
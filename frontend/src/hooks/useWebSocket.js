@@ -4,6 +4,41 @@ const WS_URL = process.env.NODE_ENV === 'production'
   ? `ws://${window.location.host}/ws`
   : 'ws://localhost:6541/ws';
 
+// Binary audio protocol (v2): 16 byte header + int16 PCM, see backend/protocol.py
+const PROTOCOL_VERSION = 2;
+const HEADER_SIZE = 16;
+const FORMAT_INT16 = 1;
+const STREAM_ID = 1;
+
+// Convert Float32Array to base64 (protocol v1 fallback)
+const float32ToBase64 = (float32Array) => {
+  const bytes = new Uint8Array(float32Array.buffer, float32Array.byteOffset, float32Array.byteLength);
+  let binary = '';
+  for (let i = 0; i < bytes.byteLength; i++) {
+    binary += String.fromCharCode(bytes[i]);
+  }
+  return btoa(binary);
+};
+
+// Build a v2 binary frame from float32 samples
+const buildAudioFrame = (float32Array, sequence, sampleRate) => {
+  const buffer = new ArrayBuffer(HEADER_SIZE + float32Array.length * 2);
+  const header = new DataView(buffer, 0, HEADER_SIZE);
+  header.setUint8(0, PROTOCOL_VERSION);
+  header.setUint8(1, FORMAT_INT16);
+  header.setUint16(2, 1, true);
+  header.setUint32(4, STREAM_ID, true);
+  header.setUint32(8, sampleRate, true);
+  header.setUint32(12, sequence, true);
+
+  const samples = new Int16Array(buffer, HEADER_SIZE);
+  for (let i = 0; i < float32Array.length; i++) {
+    const s = Math.max(-1, Math.min(1, float32Array[i]));
+    samples[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+  }
+  return buffer;
+};
+
 export const useWebSocket = () => {
   const [isConnected, setIsConnected] = useState(false);
   const [device, setDevice] = useState('cpu');
@@ -14,6 +49,9 @@ export const useWebSocket = () => {
   const ws = useRef(null);
   const reconnectTimeout = useRef(null);
   const pingInterval = useRef(null);
+  const protocolVersion = useRef(1);
+  const sequence = useRef(0);
+  const retryAfter = useRef(null);
 
   const connect = useCallback(() => {
     try {
@@ -22,6 +60,12 @@ export const useWebSocket = () => {
       ws.current.onopen = () => {
         console.log('WebSocket connected');
         setIsConnected(true);
+        protocolVersion.current = 1;
+        sequence.current = 0;
+        ws.current.binaryType = 'arraybuffer';
+        
+        // Ask the server for the binary audio protocol
+        ws.current.send(JSON.stringify({ type: 'hello', protocol: PROTOCOL_VERSION }));
         
         // Start ping interval to keep connection alive
         pingInterval.current = setInterval(() => {
@@ -40,8 +84,13 @@ export const useWebSocket = () => {
             setCurrentModel(data.model);
             break;
             
+          case 'hello':
+            protocolVersion.current = data.protocol;
+            break;
+            
           case 'transcription':
-            setTranscriptions(prev => [...prev, {
+            // A newer message supersedes any partial (non-final) hypothesis
+            setTranscriptions(prev => [...prev.filter(t => t.final), {
               text: data.text,
               final: data.final,
               timestamp: Date.now()
@@ -62,6 +111,10 @@ export const useWebSocket = () => {
             
           case 'error':
             console.error('WebSocket error:', data.message);
+            if (data.code === 'over_capacity') {
+              // Server turned the session away; reconnect when it suggests
+              retryAfter.current = data.retry_after;
+            }
             setModelLoading(false);
             break;
             
@@ -87,11 +140,13 @@ export const useWebSocket = () => {
           clearInterval(pingInterval.current);
         }
         
-        // Attempt to reconnect after 3 seconds
+        // Attempt to reconnect after 3 seconds (or the server's retry-after hint)
+        const delay = retryAfter.current ? retryAfter.current * 1000 : 3000;
+        retryAfter.current = null;
         reconnectTimeout.current = setTimeout(() => {
           console.log('Attempting to reconnect...');
           connect();
-        }, 3000);
+        }, delay);
       };
     } catch (error) {
       console.error('Failed to connect:', error);
@@ -111,14 +166,25 @@ export const useWebSocket = () => {
     }
   }, []);
 
-  const sendAudio = useCallback((audioData, format = 'webm') => {
-    if (ws.current?.readyState === WebSocket.OPEN) {
-      ws.current.send(JSON.stringify({
-        type: 'audio',
-        data: audioData,
-        format: format
-      }));
+  const sendAudio = useCallback((audioData, format = 'webm', sampleRate = 16000) => {
+    if (ws.current?.readyState !== WebSocket.OPEN) {
+      return;
     }
+
+    if (audioData instanceof Float32Array) {
+      if (protocolVersion.current >= PROTOCOL_VERSION) {
+        ws.current.send(buildAudioFrame(audioData, sequence.current++, sampleRate));
+        return;
+      }
+      audioData = float32ToBase64(audioData);
+    }
+
+    ws.current.send(JSON.stringify({
+      type: 'audio',
+      data: audioData,
+      format: format,
+      sample_rate: sampleRate
+    }));
   }, []);
 
   const changeModel = useCallback((modelName) => {
@@ -131,6 +197,12 @@ export const useWebSocket = () => {
     }
   }, []);
 
+  const flush = useCallback(() => {
+    if (ws.current?.readyState === WebSocket.OPEN) {
+      ws.current.send(JSON.stringify({ type: 'flush' }));
+    }
+  }, []);
+
   const clearTranscriptions = useCallback(() => {
     setTranscriptions([]);
   }, []);
@@ -150,6 +222,7 @@ export const useWebSocket = () => {
     modelLoading,
     sendAudio,
     changeModel,
+    flush,
     clearTranscriptions
   };
 };
\ No newline at end of file
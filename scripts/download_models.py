@@ -1,72 +1,144 @@
 #!/usr/bin/env python3
-"""Download Whisper models for faster-whisper"""
+"""Populate the local Whisper model store for offline, network-free startup
+
+Models are fetched as CTranslate2 files straight into $WHISPER_MODEL_DIR
+(default: ./models) without loading them. Every file is checksummed into
+manifest.json. With --quantization the weights are converted from the
+original OpenAI checkpoint and stored pre-quantized, so int8 CPU nodes load
+them without a conversion step (requires ``transformers``).
+
+    python scripts/download_models.py --models small medium
+    python scripts/download_models.py --models small --quantization int8
+    python scripts/download_models.py --verify
+"""
 
 import os
 import sys
-
-# Set NVIDIA library paths before importing
-try:
-    import nvidia.cublas.lib
-    import nvidia.cudnn.lib
-    cublas_dir = os.path.dirname(nvidia.cublas.lib.__file__)
-    cudnn_dir = os.path.dirname(nvidia.cudnn.lib.__file__) 
-    os.environ['LD_LIBRARY_PATH'] = f"{cublas_dir}:{cudnn_dir}:{os.environ.get('LD_LIBRARY_PATH', '')}"
-except ImportError:
-    pass
-
-from faster_whisper import WhisperModel
+import shutil
+import tempfile
 import argparse
 
-def download_model(model_name):
-    """Download a specific Whisper model"""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.model_store import (
+    MODEL_DIR, QUANTIZED_COMPUTE_TYPES, entry_name, load_manifest, record_entry, verify_entry
+)
+
+MODELS = ["tiny", "base", "small", "medium", "large-v2", "large-v3"]
+# Files the Whisper runtime needs next to model.bin
+RUNTIME_FILES = ["tokenizer.json", "preprocessor_config.json"]
+
+
+def fetch(model_name, output_dir):
+    """Download the published CTranslate2 model files (no model load)"""
+    from faster_whisper.utils import download_model
+    download_model(model_name, output_dir=output_dir)
+    return f"faster-whisper:{model_name}"
+
+
+def convert(model_name, output_dir, quantization):
+    """Convert the original checkpoint with the requested weight quantization"""
+    from ctranslate2.converters import TransformersConverter
+    source = f"openai/whisper-{model_name}"
+    converter = TransformersConverter(source, copy_files=RUNTIME_FILES)
+    converter.convert(output_dir, quantization=quantization, force=True)
+    return source
+
+
+def download_model(model_name, model_dir, quantization=None):
+    """Add one model to the store; returns True on success"""
+    name = entry_name(model_name, quantization)
     print(f"\n{'='*50}")
-    print(f"Downloading Whisper model: {model_name}")
+    print(f"Storing Whisper model: {name}")
     print('='*50)
-    
+
+    target = os.path.join(model_dir, name)
+    # Build in a scratch directory and move into place, so a failed download
+    # never leaves a half-written entry behind
+    scratch = tempfile.mkdtemp(prefix=f".{name}-", dir=model_dir)
     try:
-        # Initialize model (this triggers download if not cached)
-        print(f"Initializing {model_name} model...")
-        model = WhisperModel(model_name, device="cpu")  # Use CPU for download only
-        print(f"✓ Model {model_name} downloaded and cached successfully")
-        
-        # Clean up
-        del model
-        
+        if quantization:
+            print(f"Converting {model_name} to {quantization}...")
+            source = convert(model_name, scratch, quantization)
+        else:
+            print(f"Downloading {model_name}...")
+            source = fetch(model_name, scratch)
+            # huggingface_hub leaves download bookkeeping in the target directory
+            shutil.rmtree(os.path.join(scratch, ".cache"), ignore_errors=True)
+
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(scratch, target)
+        entry = record_entry(model_dir, name, model_name, source, quantization)
+        size_mb = sum(f["size"] for f in entry["files"].values()) / (1024 * 1024)
+        print(f"✓ {name} stored in {target} ({size_mb:.0f} MB, {len(entry['files'])} files checksummed)")
+        return True
+
     except Exception as e:
-        print(f"✗ Error downloading {model_name}: {e}")
+        print(f"✗ Error storing {name}: {e}")
         return False
-    
-    return True
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def verify(model_dir):
+    """Re-hash every stored file against the manifest"""
+    entries = load_manifest(model_dir).get("models", {})
+    if not entries:
+        print(f"No models in {model_dir}")
+        return 1
+
+    failed = 0
+    for name, entry in sorted(entries.items()):
+        problem = verify_entry(model_dir, entry, full=True)
+        if problem:
+            failed += 1
+            print(f"✗ {name}: {problem}")
+        else:
+            print(f"✓ {name}")
+    return 1 if failed else 0
+
 
 def main():
-    parser = argparse.ArgumentParser(description="Download Whisper models")
-    parser.add_argument("--models", nargs="+", 
+    parser = argparse.ArgumentParser(description="Download Whisper models into the local model store")
+    parser.add_argument("--models", nargs="+",
                        default=["tiny", "base", "small", "medium"],
-                       choices=["tiny", "base", "small", "medium", "large-v2", "large-v3"],
+                       choices=MODELS,
                        help="Models to download")
-    
+    parser.add_argument("--dir", default=MODEL_DIR,
+                       help="Model store directory (default: $WHISPER_MODEL_DIR or ./models)")
+    parser.add_argument("--quantization", default=None,
+                       choices=list(QUANTIZED_COMPUTE_TYPES),
+                       help="Store weights pre-quantized (converts from the OpenAI checkpoint)")
+    parser.add_argument("--verify", action="store_true",
+                       help="Check every stored file against its manifest checksum and exit")
+
     args = parser.parse_args()
-    
+    os.makedirs(args.dir, exist_ok=True)
+
+    if args.verify:
+        return verify(args.dir)
+
     print("Whisper Model Downloader")
     print("="*50)
     print(f"Models to download: {', '.join(args.models)}")
-    
+    print(f"Model store: {args.dir}")
+
     success = []
     failed = []
-    
+
     for model in args.models:
-        if download_model(model):
+        if download_model(model, args.dir, args.quantization):
             success.append(model)
         else:
             failed.append(model)
-    
+
     print("\n" + "="*50)
     print("Download Summary:")
     print(f"✓ Successfully downloaded: {', '.join(success) if success else 'None'}")
     if failed:
         print(f"✗ Failed to download: {', '.join(failed)}")
-    
+
     return 0 if not failed else 1
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""WebSocket load test: replay a WAV file over N concurrent clients in real time
+
+Each client streams the file to /ws in fixed-size chunks at real-time pace
+(protocol v2 binary frames by default), sends a flush at the end and waits
+for the final results. Reports time-to-first-result, end-of-stream latency
+(flush to last final result), throughput and dropped chunks.
+
+To load-test the server on a CPU-only machine without downloading a model:
+
+    WHISPER_FAKE_MODEL=true WHISPER_FAKE_RTF=0.1 python backend/main.py
+    python scripts/load_test.py --clients 50
+"""
+
+import os
+import sys
+import argparse
+import asyncio
+import base64
+import json
+import time
+import wave
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import websockets
+
+# Reuse the server's frame encoder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from protocol import encode_frame, FORMAT_INT16
+
+SAMPLE_RATE = 16000
+
+
+def load_wav(path: str) -> np.ndarray:
+    """Read a PCM WAV file as 16 kHz mono float32"""
+    with wave.open(path, "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+    audio = np.frombuffer(frames, dtype=dtype).astype(np.float32)
+    if width == 1:
+        audio = (audio - 128) / 128.0
+    else:
+        audio /= float(2 ** (8 * width - 1))
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        # Linear interpolation is good enough for load generation
+        positions = np.arange(0, len(audio) * SAMPLE_RATE / rate) * rate / SAMPLE_RATE
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+@dataclass
+class ClientResult:
+    """Measurements from one simulated client"""
+    client_id: int
+    audio_seconds: float = 0.0
+    chunks_sent: int = 0
+    first_result_latency: Optional[float] = None
+    end_latency: Optional[float] = None
+    results: int = 0
+    partials: int = 0
+    dropped_chunks: int = 0
+    overflow_ms: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+
+async def run_client(client_id: int, url: str, audio: np.ndarray, chunk_ms: int,
+                     protocol: int, loops: int, drain_timeout: float) -> ClientResult:
+    result = ClientResult(client_id)
+    chunk = int(SAMPLE_RATE * chunk_ms / 1000)
+    first_send = None
+    flush_sent = None
+    last_final = None
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.send(json.dumps({"type": "hello", "protocol": protocol}))
+
+            async def receive():
+                nonlocal last_final
+                async for raw in ws:
+                    message = json.loads(raw)
+                    now = time.monotonic()
+                    kind = message.get("type")
+                    if kind == "transcription":
+                        if result.first_result_latency is None and first_send is not None:
+                            result.first_result_latency = now - first_send
+                        if message.get("final"):
+                            result.results += 1
+                            last_final = now
+                        else:
+                            result.partials += 1
+                    elif kind == "queue_overflow":
+                        result.dropped_chunks = max(result.dropped_chunks, message.get("dropped_chunks", 0))
+                    elif kind == "buffer_overflow":
+                        result.overflow_ms += message.get("dropped_ms", 0)
+                    elif kind == "error":
+                        result.errors.append(message.get("message", ""))
+
+            receiver = asyncio.create_task(receive())
+            start = time.monotonic()
+            sequence = 0
+            for _ in range(loops):
+                for offset in range(0, len(audio), chunk):
+                    # Real-time pacing: chunk N leaves at start + N * chunk duration
+                    delay = start + sequence * chunk_ms / 1000 - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    samples = audio[offset:offset + chunk]
+                    if protocol >= 2:
+                        await ws.send(encode_frame(samples, stream_id=client_id, sequence=sequence,
+                                                   sample_format=FORMAT_INT16))
+                    else:
+                        await ws.send(json.dumps({
+                            "type": "audio",
+                            "format": "pcm",
+                            "data": base64.b64encode(samples.astype(np.float32).tobytes()).decode()
+                        }))
+                    if first_send is None:
+                        first_send = time.monotonic()
+                    sequence += 1
+                    result.chunks_sent += 1
+                    result.audio_seconds += len(samples) / SAMPLE_RATE
+
+            await ws.send(json.dumps({"type": "flush"}))
+            flush_sent = time.monotonic()
+
+            # Wait until results stop arriving
+            deadline = flush_sent + drain_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+                if last_final is not None and last_final >= flush_sent and time.monotonic() - last_final > 1.0:
+                    break
+            if last_final is not None and last_final >= flush_sent:
+                result.end_latency = last_final - flush_sent
+            receiver.cancel()
+    except Exception as e:
+        result.errors.append(str(e))
+    return result
+
+
+def percentiles(values: List[float]) -> str:
+    if not values:
+        return "n/a"
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"p50={p50 * 1000:.0f}ms  p95={p95 * 1000:.0f}ms  p99={p99 * 1000:.0f}ms"
+
+
+async def main_async(args) -> int:
+    audio = load_wav(args.wav)
+    print(f"Replaying {args.wav} ({len(audio) / SAMPLE_RATE:.1f}s) x{args.loops} "
+          f"over {args.clients} clients to {args.url}")
+
+    started = time.monotonic()
+    tasks = []
+    for client_id in range(args.clients):
+        tasks.append(asyncio.create_task(run_client(
+            client_id + 1, args.url, audio, args.chunk_ms, args.protocol, args.loops, args.drain_timeout
+        )))
+        if args.ramp > 0:
+            await asyncio.sleep(args.ramp / args.clients)
+    results = await asyncio.gather(*tasks)
+    wall = time.monotonic() - started
+
+    audio_total = sum(r.audio_seconds for r in results)
+    chunks_total = sum(r.chunks_sent for r in results)
+    dropped = sum(r.dropped_chunks for r in results)
+    failed = [r for r in results if r.errors]
+
+    print("\n" + "=" * 60)
+    print("Load Test Summary")
+    print("=" * 60)
+    print(f"Clients:               {len(results)} ({len(failed)} with errors)")
+    print(f"Time to first result:  {percentiles([r.first_result_latency for r in results if r.first_result_latency is not None])}")
+    print(f"End-of-stream latency: {percentiles([r.end_latency for r in results if r.end_latency is not None])}")
+    print(f"Throughput:            {audio_total / wall:.1f} audio-seconds/s over {wall:.1f}s")
+    print(f"Final results:         {sum(r.results for r in results)}  partials: {sum(r.partials for r in results)}")
+    print(f"Dropped chunks:        {dropped}/{chunks_total} ({100 * dropped / max(chunks_total, 1):.2f}%)")
+    print(f"Buffer overflow:       {sum(r.overflow_ms for r in results) / 1000:.1f}s of audio")
+    for r in failed[:5]:
+        print(f"  client {r.client_id}: {r.errors[0]}")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket load test for the speech-to-text backend")
+    parser.add_argument("--url", default="ws://localhost:6541/ws", help="WebSocket endpoint")
+    parser.add_argument("--wav", default=os.path.join(os.path.dirname(__file__), "..", "recordings", "test_recording.wav"),
+                        help="WAV file to replay")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent clients")
+    parser.add_argument("--chunk-ms", type=int, default=250, help="Audio per message")
+    parser.add_argument("--loops", type=int, default=1, help="Times each client replays the file")
+    parser.add_argument("--protocol", type=int, default=2, choices=[1, 2], help="1 = JSON/base64, 2 = binary frames")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Seconds over which to start all clients")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="Max wait for results after flush")
+
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
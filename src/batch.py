@@ -0,0 +1,232 @@
+"""Batch transcription of files for the command-line tool
+
+Inputs may be files, directories (searched recursively for audio files) or
+glob patterns. Each file is decoded incrementally with PyAV and transcribed
+in windows of ``WINDOW_S`` seconds, cut at the quietest moment near the end
+of each window. Memory use therefore does not depend on file length. Files
+are spread over worker processes, and each process holds its own model
+replica. Results are written as each file finishes: one JSON line per file
+and, optionally, one SRT file per input. A throughput summary is printed at
+the end.
+"""
+
+import glob
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".flac", ".ogg", ".opus", ".m4a", ".aac", ".webm", ".mkv", ".mp4", ".wma"}
+# Audio decoded per model call; cut points are searched in the last CUT_SEARCH_S
+WINDOW_S = 300
+CUT_SEARCH_S = 5
+CUT_FRAME_S = 0.03
+
+# Model replica of this worker process (set by _init_worker)
+_stt = None
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """Files named by paths, directories and glob patterns, in a stable order"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                files.extend(os.path.join(root, name) for name in names
+                             if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS)
+        elif os.path.isfile(pattern):
+            files.append(pattern)
+        else:
+            files.extend(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(set(os.path.abspath(path) for path in files))
+
+
+def read_audio(path: str, sample_rate: int = SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """Decode a file incrementally into mono float32 blocks at ``sample_rate``"""
+    import av
+
+    resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+    with av.open(path, metadata_errors="ignore") as container:
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                yield resampled.to_ndarray().reshape(-1)
+        # Samples still held by the resampler
+        for resampled in resampler.resample(None):
+            yield resampled.to_ndarray().reshape(-1)
+
+
+def quiet_cut(audio: np.ndarray, search_samples: int, frame_samples: int) -> int:
+    """Sample index of the quietest frame in the last ``search_samples`` of ``audio``"""
+    start = max(0, len(audio) - search_samples)
+    tail = audio[start:]
+    n_frames = len(tail) // frame_samples
+    if n_frames == 0:
+        return len(audio)
+    frames = tail[:n_frames * frame_samples].reshape(n_frames, frame_samples)
+    quietest = int(np.argmin(np.mean(frames * frames, axis=1)))
+    return start + quietest * frame_samples + frame_samples // 2
+
+
+def transcribe_file(model, path: str, language: Optional[str] = "en", beam_size: int = 5,
+                    window_s: float = WINDOW_S) -> dict:
+    """Transcribe one file window by window; timestamps are relative to the file start"""
+    window = int(window_s * SAMPLE_RATE)
+    search = int(CUT_SEARCH_S * SAMPLE_RATE)
+    frame = int(CUT_FRAME_S * SAMPLE_RATE)
+    result = {"file": path, "language": language, "segments": []}
+    decode_seconds = 0.0
+    offset = 0
+    pending: List[np.ndarray] = []
+    pending_samples = 0
+
+    def decode(audio: np.ndarray, offset: int):
+        nonlocal decode_seconds
+        started = time.monotonic()
+        segments, info = model.transcribe(audio, language=result["language"], beam_size=beam_size,
+                                          vad_filter=True, vad_parameters=dict(min_silence_duration_ms=500))
+        # Detected on the first window, then kept for the rest of the file
+        result["language"] = info.language
+        for segment in segments:
+            result["segments"].append({
+                "start": round(segment.start + offset / SAMPLE_RATE, 3),
+                "end": round(segment.end + offset / SAMPLE_RATE, 3),
+                "text": segment.text.strip(),
+            })
+        decode_seconds += time.monotonic() - started
+
+    for block in read_audio(path):
+        pending.append(block)
+        pending_samples += len(block)
+        if pending_samples < window:
+            continue
+        audio = np.concatenate(pending)
+        cut = quiet_cut(audio[:window], search, frame)
+        decode(audio[:cut], offset)
+        offset += cut
+        pending = [audio[cut:]]
+        pending_samples = len(pending[0])
+
+    if pending_samples:
+        decode(np.concatenate(pending), offset)
+        offset += pending_samples
+
+    result["duration"] = round(offset / SAMPLE_RATE, 3)
+    result["decode_seconds"] = round(decode_seconds, 3)
+    return result
+
+
+def _init_worker(load_model: Callable, options: dict):
+    global _stt
+    # stdout may carry the JSONL results; model loading messages go to stderr
+    sys.stdout = sys.stderr
+    _stt = load_model(**options)
+
+
+def _transcribe_in_worker(path: str, language: Optional[str], beam_size: int) -> dict:
+    try:
+        return transcribe_file(_stt.model, path, language, beam_size)
+    except Exception as e:
+        # One unreadable file must not end the whole job
+        return {"file": path, "error": str(e)}
+
+
+def format_srt_time(seconds: float) -> str:
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+def write_srt(segments: List[dict], path: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for index, segment in enumerate(segments, 1):
+            f.write(f"{index}\n{format_srt_time(segment['start'])} --> {format_srt_time(segment['end'])}\n"
+                    f"{segment['text']}\n\n")
+    os.replace(tmp, path)
+
+
+def srt_path(path: str, root: str, srt_dir: str) -> str:
+    """Mirror the input's location below ``root`` inside ``srt_dir``"""
+    relative = os.path.relpath(path, root) if root else os.path.basename(path)
+    target = os.path.join(srt_dir, os.path.splitext(relative)[0] + ".srt")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    return target
+
+
+def run_batch(files: List[str], load_model: Callable, model_options: dict, workers: int = 1,
+              language: Optional[str] = "en", beam_size: int = 5,
+              output: str = "-", srt_dir: Optional[str] = None) -> int:
+    """Transcribe ``files`` on ``workers`` model replicas; returns the number of failed files
+
+    ``load_model(**model_options)`` runs once in every worker process and
+    must return an object with a ``model`` attribute.
+    """
+    root = os.path.commonpath([os.path.dirname(path) for path in files]) if files else ""
+    out = sys.stdout if output == "-" else open(output, "a", encoding="utf-8")
+    started = time.monotonic()
+    audio_seconds = 0.0
+    decode_seconds = 0.0
+    transcribed = 0
+    failed = 0
+
+    # Spawned workers: CUDA cannot be initialized in a forked child
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                             initializer=_init_worker, initargs=(load_model, model_options)) as pool:
+        futures = {pool.submit(_transcribe_in_worker, path, language, beam_size): path for path in files}
+        broken = None
+        unprocessed = 0
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    # A worker died (model failed to load, out of memory): every unfinished file fails
+                    broken = e
+                    unprocessed += 1
+                    result = {"file": futures[future], "error": "worker process died before finishing this file"}
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                if "error" in result:
+                    failed += 1
+                    print(f"[{done}/{len(files)}] ✗ {result['file']}: {result['error']}", file=sys.stderr)
+                    continue
+                if srt_dir:
+                    write_srt(result["segments"], srt_path(result["file"], root, srt_dir))
+                transcribed += 1
+                audio_seconds += result["duration"]
+                decode_seconds += result["decode_seconds"]
+                speed = result["duration"] / result["decode_seconds"] if result["decode_seconds"] else 0.0
+                print(f"[{done}/{len(files)}] ✓ {result['file']} ({result['duration']:.0f}s audio, "
+                      f"{speed:.1f}x real time)", file=sys.stderr)
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            print("\nStopping after the files in progress...", file=sys.stderr)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    if broken is not None:
+        print(f"\nWorker pool stopped ({broken}); see the worker error above. "
+              f"{unprocessed} files were not processed.", file=sys.stderr)
+
+    elapsed = time.monotonic() - started
+    print("\n" + "=" * 50, file=sys.stderr)
+    print(f"Files: {transcribed} transcribed, {failed} failed, {len(files) - transcribed - failed} skipped",
+          file=sys.stderr)
+    print(f"Audio: {audio_seconds / 3600:.2f} h in {elapsed / 3600:.2f} h wall-clock "
+          f"({workers} workers)", file=sys.stderr)
+    if elapsed > 0:
+        print(f"Throughput: {audio_seconds / elapsed:.1f} audio hours per wall-clock hour", file=sys.stderr)
+    if audio_seconds > 0:
+        print(f"Real-time factor per worker: {decode_seconds / audio_seconds:.3f}", file=sys.stderr)
+    return failed
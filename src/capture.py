@@ -0,0 +1,132 @@
+"""Capture and inference pipeline pieces for the command-line transcriber
+
+The sound-card callback only copies each block into a preallocated ring
+buffer (``AudioRing``). The main loop drains the ring, runs the VAD and hands
+finished utterances to an inference worker thread. Capture never waits for a
+decode. If the consumer falls too far behind, whole blocks are dropped and
+counted instead of letting the lag grow without bound.
+``PipelineStats`` tracks lag, real-time factor and drops.
+"""
+
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+
+class AudioRing:
+    """Fixed-capacity sample buffer written by the capture callback, read by one consumer"""
+
+    def __init__(self, capacity_samples: int):
+        self.capacity = capacity_samples
+        self._buffer = np.zeros(capacity_samples, dtype=np.float32)
+        # Total samples written and read; their difference is the backlog
+        self._written = 0
+        self._read = 0
+        self._ready = threading.Condition()
+        self.blocks = 0
+        self.dropped_blocks = 0
+        self.dropped_samples = 0
+
+    @property
+    def pending(self) -> int:
+        return self._written - self._read
+
+    def write(self, samples: np.ndarray) -> bool:
+        """Append one captured block; drops it (returns False) if it does not fit"""
+        samples = samples.reshape(-1)
+        n = len(samples)
+        with self._ready:
+            self.blocks += 1
+            if self.pending + n > self.capacity:
+                self.dropped_blocks += 1
+                self.dropped_samples += n
+                return False
+            start = self._written % self.capacity
+            first = min(n, self.capacity - start)
+            self._buffer[start:start + first] = samples[:first]
+            self._buffer[:n - first] = samples[first:]
+            self._written += n
+            self._ready.notify()
+        return True
+
+    def read(self, timeout: Optional[float] = None) -> np.ndarray:
+        """Everything captured since the last read (empty if nothing arrived within ``timeout``)"""
+        with self._ready:
+            if not self.pending:
+                self._ready.wait(timeout)
+            n = self.pending
+            start = self._read % self.capacity
+            first = min(n, self.capacity - start)
+            out = np.concatenate([self._buffer[start:start + first], self._buffer[:n - first]])
+            self._read += n
+        return out
+
+
+class UtteranceBuffer:
+    """Preallocated accumulator for the speech pieces of one utterance"""
+
+    def __init__(self, capacity_samples: int):
+        self._buffer = np.zeros(capacity_samples, dtype=np.float32)
+        self.size = 0
+
+    def append(self, samples: np.ndarray):
+        end = self.size + len(samples)
+        if end > len(self._buffer):
+            # Only when the VAD overshoots its maximum segment length
+            self._buffer = np.resize(self._buffer, max(end, 2 * len(self._buffer)))
+        self._buffer[self.size:end] = samples
+        self.size = end
+
+    def take(self) -> np.ndarray:
+        """Copy out the utterance and start a new one"""
+        audio = self._buffer[:self.size].copy()
+        self.size = 0
+        return audio
+
+
+class PipelineStats:
+    """Lag, real-time factor and drop counters (updated by the inference worker)"""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.started = time.monotonic()
+        self.utterances = 0
+        self.audio_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.rtf = 0.0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.dropped_utterances = 0
+
+    def record(self, audio_samples: int, decode_seconds: float, lag_seconds: float):
+        """One decoded utterance; ``lag`` is the time from its end being captured to its text"""
+        audio_seconds = audio_samples / self.sample_rate
+        self.utterances += 1
+        self.audio_seconds += audio_seconds
+        self.decode_seconds += decode_seconds
+        if audio_seconds > 0:
+            rtf = decode_seconds / audio_seconds
+            self.rtf = rtf if self.utterances == 1 else 0.8 * self.rtf + 0.2 * rtf
+        self.lag = lag_seconds
+        self.max_lag = max(self.max_lag, lag_seconds)
+
+    def line(self, ring: AudioRing, queued: int) -> str:
+        """One-line status for the current state"""
+        return (f"rtf {self.rtf:.2f} | lag {self.lag:.1f}s | "
+                f"capture backlog {ring.pending / self.sample_rate:.1f}s | queued {queued} | "
+                f"dropped {ring.dropped_blocks} blocks, {self.dropped_utterances} utterances")
+
+    def summary(self, ring: AudioRing) -> str:
+        elapsed = time.monotonic() - self.started
+        overall_rtf = self.decode_seconds / self.audio_seconds if self.audio_seconds else 0.0
+        dropped_s = ring.dropped_samples / self.sample_rate
+        return "\n".join([
+            f"Listened {elapsed:.0f}s, transcribed {self.utterances} utterances "
+            f"({self.audio_seconds:.1f}s of speech)",
+            f"Real-time factor {overall_rtf:.2f} (decode time / speech time), "
+            f"lag last {self.lag:.1f}s, max {self.max_lag:.1f}s",
+            f"Dropped {ring.dropped_blocks}/{ring.blocks} capture blocks ({dropped_s:.1f}s), "
+            f"{self.dropped_utterances} utterances",
+        ])
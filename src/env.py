@@ -0,0 +1,13 @@
+"""Environment settings shared by the backend and the command-line tools"""
+
+import os
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Boolean setting: "1", "true" or "yes" (any case) turn it on"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in TRUE_VALUES
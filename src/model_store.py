@@ -0,0 +1,151 @@
+"""Local model store: CTranslate2 Whisper models on disk with a checksummed manifest
+
+``scripts/download_models.py`` fills the store; the backend and the CLI load
+from it by path, so startup never touches the Hugging Face hub. Layout::
+
+    $WHISPER_MODEL_DIR/
+        manifest.json
+        small/              # as published (float16 weights)
+        small-int8/         # pre-quantized with --quantization int8
+
+The manifest records, for every entry, the source, quantization and the
+SHA-256 and size of each file. Loading checks file sizes only (cheap);
+``download_models.py --verify`` re-hashes everything.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+try:
+    from src.env import env_flag
+except ImportError:  # imported from src/ by the command-line tool
+    from env import env_flag
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.getenv("WHISPER_MODEL_DIR", os.path.join(ROOT_DIR, "models"))
+# Never contact the hub: models must be in the store (or already in the HF cache)
+OFFLINE = env_flag("WHISPER_OFFLINE", False)
+
+MANIFEST = "manifest.json"
+HASH_BLOCK = 1 << 20
+
+# Compute types that can use a store entry quantized to the given type
+QUANTIZED_COMPUTE_TYPES = {
+    "int8": ("int8", "int8_float32", "int8_float16", "int8_bfloat16"),
+    "int8_float16": ("int8_float16", "int8", "int8_float32"),
+    "int16": ("int16",),
+    "float16": ("float16", "float32", "bfloat16"),
+}
+
+
+def entry_name(model_size: str, quantization: Optional[str] = None) -> str:
+    return f"{model_size}-{quantization}" if quantization else model_size
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(model_dir: str = MODEL_DIR) -> dict:
+    try:
+        with open(os.path.join(model_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"models": {}}
+
+
+def save_manifest(manifest: dict, model_dir: str = MODEL_DIR):
+    path = os.path.join(model_dir, MANIFEST)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def record_entry(model_dir: str, name: str, model_size: str, source: str,
+                 quantization: Optional[str]) -> dict:
+    """Checksum every file of a store entry and add it to the manifest"""
+    path = os.path.join(model_dir, name)
+    files = {}
+    for filename in sorted(os.listdir(path)):
+        file_path = os.path.join(path, filename)
+        if os.path.isfile(file_path):
+            files[filename] = {"sha256": sha256_file(file_path), "size": os.path.getsize(file_path)}
+    entry = {
+        "model": model_size,
+        "path": name,
+        "source": source,
+        "quantization": quantization,
+        "files": files,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    manifest = load_manifest(model_dir)
+    manifest.setdefault("models", {})[name] = entry
+    save_manifest(manifest, model_dir)
+    return entry
+
+
+def verify_entry(model_dir: str, entry: dict, full: bool = False) -> Optional[str]:
+    """Return a problem description, or None if the entry is intact
+
+    Without ``full`` only existence and sizes are checked.
+    """
+    path = os.path.join(model_dir, entry["path"])
+    for filename, expected in entry["files"].items():
+        file_path = os.path.join(path, filename)
+        if not os.path.isfile(file_path):
+            return f"missing {filename}"
+        if os.path.getsize(file_path) != expected["size"]:
+            return f"size mismatch for {filename}"
+        if full and sha256_file(file_path) != expected["sha256"]:
+            return f"checksum mismatch for {filename}"
+    return None
+
+
+def find_entry(model_size: str, compute_type: Optional[str] = None,
+               model_dir: str = MODEL_DIR) -> Optional[Dict]:
+    """Best intact store entry for a model: a matching quantization first, then the original"""
+    models = load_manifest(model_dir).get("models", {})
+    candidates = [e for e in models.values() if e.get("model") == model_size]
+    if not candidates:
+        return None
+
+    def rank(entry):
+        quantization = entry.get("quantization")
+        if quantization and compute_type in QUANTIZED_COMPUTE_TYPES.get(quantization, ()):
+            return 0
+        return 1 if quantization is None else 2
+
+    for entry in sorted(candidates, key=rank):
+        if rank(entry) < 2 and verify_entry(model_dir, entry) is None:
+            return entry
+    return None
+
+
+def resolve_model(model_size: str, compute_type: Optional[str] = None,
+                  model_dir: str = MODEL_DIR) -> str:
+    """Local path to load ``model_size`` from, or the name itself to use the hub cache
+
+    In offline mode a model missing from the store is only looked up in the
+    local Hugging Face cache (see ``load_options``), never downloaded.
+    """
+    if os.path.isdir(model_size):
+        return model_size
+    entry = find_entry(model_size, compute_type, model_dir)
+    if entry is not None:
+        return os.path.join(model_dir, entry["path"])
+    return model_size
+
+
+def load_options(model: str) -> dict:
+    """Extra ``WhisperModel`` arguments for a resolved model"""
+    if OFFLINE and not os.path.isdir(model):
+        return {"local_files_only": True}
+    return {}
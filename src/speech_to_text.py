@@ -42,7 +42,10 @@ def setup_cuda_paths():
 cuda_available = setup_cuda_paths()
 
 # Now safe to import everything else
-import sounddevice as sd
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # No PortAudio: batch mode still works
+    sd = None
 import numpy as np
 import queue
 import threading
@@ -50,11 +53,25 @@ import time
 import argparse
 import signal
 from faster_whisper import WhisperModel
+from streaming import StreamingTranscriber, words_to_text
+from capture import AudioRing, PipelineStats, UtteranceBuffer
+from batch import expand_inputs, run_batch
+from vad import StreamingVAD
+from model_store import load_options, resolve_model
 import warnings
 warnings.filterwarnings("ignore")
 
+# GPU-only compute types and their CPU equivalents for the CPU fallback
+CPU_COMPUTE_TYPES = {
+    "float16": "float32",
+    "bfloat16": "float32",
+    "int8_float16": "int8",
+    "int8_bfloat16": "int8",
+}
+
 class SpeechToText:
-    def __init__(self, model_size="tiny", device="cuda", compute_type="float16"):
+    def __init__(self, model_size="tiny", device="cuda", compute_type=None, cpu_threads=0, num_workers=1,
+                 max_backlog_s=30.0):
         # Check if CUDA is actually available when requested
         actual_device = device
         if device == "cuda":
@@ -74,11 +91,19 @@ class SpeechToText:
         if actual_device == "cpu" and device == "cuda":
             print("💡 TIP: Check CUDA installation or use --device cpu to hide this warning\n")
         
-        print(f"Loading {model_size} model on {actual_device.upper()}...")
-        compute_type = "float16" if actual_device == "cuda" else "float32"
+        # Respect an explicit --compute-type; only GPU-only types are mapped on CPU
+        if compute_type is None:
+            compute_type = "float16" if actual_device == "cuda" else "float32"
+        elif actual_device == "cpu":
+            compute_type = CPU_COMPUTE_TYPES.get(compute_type, compute_type)
+        print(f"Loading {model_size} model on {actual_device.upper()} ({compute_type})...")
+        model_options = dict(cpu_threads=cpu_threads, num_workers=num_workers)
         
         try:
-            self.model = WhisperModel(model_size, device=actual_device, compute_type=compute_type)
+            # Load from the local model store when the model is there (no hub lookup)
+            model_path = resolve_model(model_size, compute_type)
+            self.model = WhisperModel(model_path, device=actual_device, compute_type=compute_type,
+                                      **model_options, **load_options(model_path))
             if actual_device == "cuda":
                 print("✓ Model loaded on GPU (fast transcription)")
             else:
@@ -86,7 +111,10 @@ class SpeechToText:
         except Exception as e:
             if "cuda" in str(e).lower() and actual_device == "cuda":
                 print("\n⚠️  CUDA ERROR: Failed to load on GPU, retrying with CPU...")
-                self.model = WhisperModel(model_size, device="cpu", compute_type="float32")
+                compute_type = CPU_COMPUTE_TYPES.get(compute_type, compute_type)
+                model_path = resolve_model(model_size, compute_type)
+                self.model = WhisperModel(model_path, device="cpu", compute_type=compute_type,
+                                          **model_options, **load_options(model_path))
                 print("✓ Model loaded on CPU (fallback mode)")
             else:
                 raise e
@@ -95,17 +123,48 @@ class SpeechToText:
         
         self.sample_rate = 16000
         self.recording = False
-        self.audio_queue = queue.Queue()
+        # Captured audio waiting for the main loop; blocks are dropped beyond this
+        self.ring = AudioRing(int(self.sample_rate * max_backlog_s))
         
     def callback(self, indata, frames, time, status):
         if status:
             print(status)
-        self.audio_queue.put(indata.copy())
+        # Runs on the audio thread: copy into the ring and return
+        self.ring.write(indata[:, 0])
+    
+    def _inference_worker(self, utterances, stats, show_stats):
+        """Decode utterances in order and print their text (runs in its own thread)"""
+        while True:
+            item = utterances.get()
+            if item is None:
+                return
+            audio, ended_at = item
+            started = time.monotonic()
+            segments, _ = self.model.transcribe(audio, beam_size=5, language="en")
+            # Segments are lazy: decoding happens while they are joined
+            text = " ".join(s.text for s in segments).strip()
+            stats.record(len(audio), time.monotonic() - started, time.monotonic() - ended_at)
+            
+            if text:
+                print(f"→ {text}")
+            if show_stats:
+                print(f"  [{stats.line(self.ring, utterances.qsize())}]")
     
-    def transcribe_stream(self):
-        """Process audio in chunks"""
-        buffer = []
-        chunk_length = int(self.sample_rate * 5)  # 5 second chunks
+    def transcribe_stream(self, max_segment_ms=5000, max_queued=2, show_stats=False):
+        """Transcribe each utterance once the VAD detects its endpoint
+
+        Capture, VAD and decoding run as a pipeline: the main loop keeps
+        draining the ring and running the VAD while the worker decodes.
+        When more than ``max_queued`` utterances wait for the worker, the
+        oldest is dropped so the output stays close to real time.
+        """
+        vad = StreamingVAD(self.sample_rate, max_segment_ms=max_segment_ms)
+        utterance = UtteranceBuffer(int(self.sample_rate * max_segment_ms / 1000) + self.sample_rate)
+        utterances = queue.Queue()
+        stats = PipelineStats(self.sample_rate)
+        worker = threading.Thread(target=self._inference_worker, args=(utterances, stats, show_stats),
+                                  name="inference", daemon=True)
+        worker.start()
         
         print("\nListening... Speak now! (Ctrl+C to stop)\n")
         
@@ -113,56 +172,169 @@ class SpeechToText:
                           callback=self.callback, dtype=np.float32):
             while True:
                 try:
-                    # Get audio data
-                    data = self.audio_queue.get(timeout=0.5)
-                    buffer.extend(data.flatten())
+                    # Everything captured so far; silence never leaves the VAD
+                    data = self.ring.read(timeout=0.5)
+                    for speech, ends_utterance in vad.process(data):
+                        utterance.append(speech)
+                        if not ends_utterance:
+                            continue
+                        
+                        while utterances.qsize() >= max_queued:
+                            try:
+                                utterances.get_nowait()
+                                stats.dropped_utterances += 1
+                            except queue.Empty:
+                                break
+                        utterances.put((utterance.take(), time.monotonic()))
+                        
+                except KeyboardInterrupt:
+                    print("\n\nStopping...")
+                    break
+        
+        # Let the worker finish what is already queued
+        utterances.put(None)
+        worker.join(timeout=30)
+        print(stats.summary(self.ring))
+    
+    def _decode_words(self, audio):
+        """Transcribe a window and return (start, end, word) tuples"""
+        segments, _ = self.model.transcribe(audio, beam_size=5, language="en",
+                                            word_timestamps=True, vad_filter=True)
+        return [(w.start, w.end, w.word) for s in segments for w in (s.words or [])]
+    
+    def _print_words(self, words):
+        """Print committed words over the current partial line"""
+        if words:
+            print(f"\r\033[K→ {words_to_text(words)}")
+    
+    def transcribe_streaming(self, step_ms=500, max_window_s=15.0):
+        """Re-decode a sliding window and print partial and committed text"""
+        streamer = StreamingTranscriber(self.sample_rate, step_ms=step_ms, max_window_s=max_window_s)
+        vad = StreamingVAD(self.sample_rate)
+        window = np.zeros(0, dtype=np.float32)
+        
+        print("\nListening (streaming)... Speak now! (Ctrl+C to stop)\n")
+        
+        with sd.InputStream(samplerate=self.sample_rate, channels=1, 
+                          callback=self.callback, dtype=np.float32):
+            while True:
+                try:
+                    # Drain everything captured so far
+                    data = self.ring.read(timeout=0.5)
                     
-                    # Process chunk when ready
-                    if len(buffer) >= chunk_length:
-                        audio = np.array(buffer[:chunk_length])
-                        buffer = buffer[chunk_length:]
+                    for speech, ends_utterance in vad.process(data):
+                        window = np.concatenate([window, speech])
+                        streamer.add_samples(len(speech))
+                        
+                        if ends_utterance:
+                            # Final decode of the utterance, then start afresh
+                            if streamer.pending_samples:
+                                update = streamer.update(self._decode_words(window), len(window))
+                                self._print_words(update.committed)
+                            self._print_words(streamer.finish())
+                            streamer.reset()
+                            window = np.zeros(0, dtype=np.float32)
+                            continue
+                        
+                        if not streamer.ready(len(window)):
+                            continue
+                        
+                        update = streamer.update(self._decode_words(window), len(window))
+                        window = window[update.trim_samples:]
+                        
+                        self._print_words(update.committed)
+                        if update.partial:
+                            print(f"\r\033[K  {words_to_text(update.partial)}", end="", flush=True)
                         
-                        # Skip silence
-                        if np.max(np.abs(audio)) > 0.01:
-                            # Transcribe
-                            segments, _ = self.model.transcribe(audio, beam_size=5, language="en")
-                            text = " ".join(s.text for s in segments).strip()
-                            
-                            if text:
-                                print(f"→ {text}")
-                                
-                except queue.Empty:
-                    continue
                 except KeyboardInterrupt:
+                    self._print_words(streamer.finish())
                     print("\n\nStopping...")
                     break
+        
+        if self.ring.dropped_blocks:
+            print(f"Dropped {self.ring.dropped_blocks}/{self.ring.blocks} capture blocks (decoding fell behind)")
 
 def main():
-    parser = argparse.ArgumentParser(description="Real-time speech-to-text")
+    parser = argparse.ArgumentParser(description="Real-time speech-to-text, or batch transcription of files")
+    parser.add_argument("inputs", nargs="*",
+                       help="Audio files, directories or glob patterns to transcribe (batch mode; "
+                            "without inputs the microphone is transcribed)")
     parser.add_argument("--model", default="tiny", 
                        choices=["tiny", "base", "small", "medium", "large-v2", "large-v3"],
                        help="Model size (tiny=fastest, medium=best quality)")
     parser.add_argument("--device", default="cuda",
                        choices=["cuda", "cpu"], 
                        help="Processing device")
-    parser.add_argument("--compute-type", default="float16",
-                       choices=["float16", "int8_float16", "float32"],
-                       help="Computation type")
+    parser.add_argument("--compute-type", default=None,
+                       choices=["float16", "int8_float16", "float32", "int8", "int8_float32", "int16", "bfloat16"],
+                       help="Computation type (default: float16 on GPU, float32 on CPU; int8 is fastest on CPU)")
+    parser.add_argument("--cpu-threads", type=int, default=0,
+                       help="CPU threads per model (0 = CTranslate2 default)")
+    parser.add_argument("--num-workers", type=int, default=1,
+                       help="Parallel transcriptions the model can run")
+    parser.add_argument("--streaming", action="store_true",
+                       help="Show partial text every few hundred ms instead of waiting for 5s chunks")
+    parser.add_argument("--step-ms", type=int, default=500,
+                       help="Re-decode interval in streaming mode")
+    parser.add_argument("--stats", action="store_true",
+                       help="Print real-time factor, lag and drops after every utterance")
+    parser.add_argument("--max-backlog", type=float, default=30.0,
+                       help="Seconds of captured audio kept while decoding is behind (older blocks are dropped)")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Batch mode: worker processes, each with its own model replica")
+    parser.add_argument("--output", default="-",
+                       help="Batch mode: JSONL file to append one line per transcribed file to (default: stdout)")
+    parser.add_argument("--srt-dir", default=None,
+                       help="Batch mode: also write an SRT file per input into this directory")
+    parser.add_argument("--language", default="en",
+                       help="Batch mode: spoken language, or 'auto' to detect it per file")
     
     args = parser.parse_args()
     
+    if args.inputs:
+        files = expand_inputs(args.inputs)
+        if not files:
+            print("No audio files found", file=sys.stderr)
+            sys.exit(1)
+        workers = max(1, args.workers)
+        cpu_threads = args.cpu_threads
+        if args.device == "cpu" and not cpu_threads:
+            # Split the cores between the replicas instead of oversubscribing them
+            cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f"Transcribing {len(files)} files with {workers} workers ({args.model}, {args.device})",
+              file=sys.stderr)
+        failed = run_batch(
+            files, SpeechToText,
+            dict(model_size=args.model, device=args.device, compute_type=args.compute_type,
+                 cpu_threads=cpu_threads, num_workers=args.num_workers),
+            workers=workers,
+            language=None if args.language == "auto" else args.language,
+            output=args.output,
+            srt_dir=args.srt_dir
+        )
+        sys.exit(1 if failed else 0)
+    
     # Print CUDA setup status
     if cuda_available:
         print("✓ CUDA libraries configured")
     else:
         print("⚠ CUDA libraries not found, will use CPU if CUDA fails")
     
+    if sd is None:
+        print("sounddevice is not available; pass audio files to use batch mode")
+        sys.exit(1)
+    
     # Create STT instance
-    stt = SpeechToText(model_size=args.model, device=args.device, compute_type=args.compute_type)
+    stt = SpeechToText(model_size=args.model, device=args.device, compute_type=args.compute_type,
+                       cpu_threads=args.cpu_threads, num_workers=args.num_workers,
+                       max_backlog_s=args.max_backlog)
     
     # Start transcribing
     try:
-        stt.transcribe_stream()
+        if args.streaming:
+            stt.transcribe_streaming(step_ms=args.step_ms)
+        else:
+            stt.transcribe_stream(show_stats=args.stats)
     except Exception as e:
         print(f"\nError: {e}")
         sys.exit(1)
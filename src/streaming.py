@@ -0,0 +1,142 @@
+"""Sliding-window streaming with a local-agreement commit policy
+
+The caller keeps a growing audio window and re-decodes it every few hundred
+milliseconds with word timestamps. A word is committed once two consecutive
+hypotheses agree on it (LocalAgreement-2). Everything after the committed point
+is reported as a partial hypothesis that may still change. Once text is
+committed, the caller drops the window audio behind it, so each decode only
+sees a bounded amount of audio.
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+# (start, end, text) in seconds since the start of the stream
+Word = Tuple[float, float, str]
+
+
+def words_to_text(words: List[Word]) -> str:
+    """Join Whisper word tokens (which carry their own leading spaces)"""
+    return "".join(w[2] for w in words).strip()
+
+
+def _normalize(text: str) -> str:
+    return text.strip().lower().strip(".,!?;:\"'")
+
+
+class HypothesisBuffer:
+    """Commits the longest common prefix of consecutive hypotheses"""
+
+    def __init__(self):
+        self.committed: List[Word] = []
+        self.previous: List[Word] = []
+        self.last_committed_time = 0.0
+
+    def insert(self, words: List[Word]) -> List[Word]:
+        """Feed a new hypothesis and return the words it commits"""
+        # Only words after the committed point are still open
+        new = [w for w in words if w[0] > self.last_committed_time - 0.1]
+
+        # The window may still start before the last committed word; drop any
+        # n-gram at the head of the hypothesis that repeats the committed tail
+        if new and self.committed and abs(new[0][0] - self.last_committed_time) < 1:
+            for n in range(min(len(self.committed), len(new), 5), 0, -1):
+                tail = [_normalize(w[2]) for w in self.committed[-n:]]
+                head = [_normalize(w[2]) for w in new[:n]]
+                if tail == head:
+                    new = new[n:]
+                    break
+
+        commit = []
+        while new and self.previous and _normalize(new[0][2]) == _normalize(self.previous[0][2]):
+            commit.append(new.pop(0))
+            self.previous.pop(0)
+        self.previous = new
+
+        if commit:
+            self.committed.extend(commit)
+            self.last_committed_time = commit[-1][1]
+        return commit
+
+    def flush(self) -> List[Word]:
+        """Commit whatever is still pending (end of stream)"""
+        pending = self.previous
+        self.previous = []
+        if pending:
+            self.committed.extend(pending)
+            self.last_committed_time = pending[-1][1]
+        return pending
+
+
+@dataclass
+class StreamingUpdate:
+    """Result of feeding one hypothesis to the streamer"""
+    committed: List[Word] = field(default_factory=list)
+    partial: List[Word] = field(default_factory=list)
+    trim_samples: int = 0
+
+
+class StreamingTranscriber:
+    """Decides when to re-decode the window, what to commit and how far to trim
+
+    The audio itself stays with the caller (a numpy buffer or the session's
+    ring buffer). ``window_offset`` is the stream time of the first sample in
+    that buffer.
+    """
+
+    def __init__(self, sample_rate: int = 16000, step_ms: float = 500,
+                 min_window_ms: float = 500, max_window_s: float = 15.0,
+                 trim_window_s: float = 5.0):
+        self.sample_rate = sample_rate
+        self.step_samples = int(sample_rate * step_ms / 1000)
+        self.min_window_samples = int(sample_rate * min_window_ms / 1000)
+        self.max_window_s = max_window_s
+        self.trim_window_s = trim_window_s
+        self.hypothesis = HypothesisBuffer()
+        self.window_offset = 0.0
+        self.pending_samples = 0
+
+    def add_samples(self, count: int):
+        """Record that ``count`` new samples were appended to the caller's window"""
+        self.pending_samples += count
+
+    def ready(self, window_samples: int, step_scale: float = 1.0) -> bool:
+        """Whether enough new audio arrived to justify another decode
+
+        ``step_scale`` stretches the re-decode interval (e.g. under server load).
+        """
+        return (self.pending_samples >= self.step_samples * step_scale
+                and window_samples >= self.min_window_samples)
+
+    def update(self, words: List[Word], window_samples: int) -> StreamingUpdate:
+        """Feed the words decoded from the current window (timestamps relative to the window)"""
+        self.pending_samples = 0
+        words = [(s + self.window_offset, e + self.window_offset, t) for s, e, t in words]
+        committed = self.hypothesis.insert(words)
+        window_s = window_samples / self.sample_rate
+
+        trim_to = None
+        if window_s >= self.max_window_s:
+            # Nothing stabilized within the window; commit it rather than grow unbounded
+            committed += self.hypothesis.flush()
+            trim_to = self.window_offset + window_s
+        elif window_s >= self.trim_window_s and self.hypothesis.committed:
+            trim_to = self.hypothesis.last_committed_time
+
+        trim_samples = 0
+        if trim_to is not None and trim_to > self.window_offset:
+            trim_samples = min(int((trim_to - self.window_offset) * self.sample_rate), window_samples)
+            self.window_offset += trim_samples / self.sample_rate
+
+        return StreamingUpdate(committed, list(self.hypothesis.previous), trim_samples)
+
+    def finish(self) -> List[Word]:
+        """Commit the remaining hypothesis at end of stream"""
+        self.pending_samples = 0
+        return self.hypothesis.flush()
+
+    def reset(self):
+        """Start a new stream"""
+        self.hypothesis = HypothesisBuffer()
+        self.window_offset = 0.0
+        self.pending_samples = 0
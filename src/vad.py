@@ -0,0 +1,111 @@
+"""Streaming voice activity detection for live audio
+
+Frames are classified by energy against an adaptive noise floor, which is
+cheap enough to run on every incoming chunk. Speech is passed through in
+pieces as it arrives. Each piece is flagged when it ends an utterance, i.e.
+after ``min_silence_ms`` of silence or once the utterance reaches
+``max_segment_ms``. Silence is never passed through, so nothing reaches the
+model while nobody is talking.
+"""
+
+from collections import deque
+from typing import List, Tuple
+
+import numpy as np
+
+
+class StreamingVAD:
+    """Energy-based streaming VAD with onset debounce, pre-roll and endpointing"""
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 30,
+                 threshold_db: float = 12.0, min_energy_db: float = -55.0,
+                 min_speech_ms: int = 150, min_silence_ms: int = 500,
+                 max_segment_ms: int = 10000, pre_roll_ms: int = 200):
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.min_silence_samples = int(sample_rate * min_silence_ms / 1000)
+        self.max_segment_samples = int(sample_rate * max_segment_ms / 1000)
+
+        # Pre-roll also holds the onset frames until speech is confirmed
+        self._pre_roll = deque(maxlen=max(1, pre_roll_ms // frame_ms) + self.min_speech_frames)
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self.noise_floor_db = min_energy_db - threshold_db
+        self.in_speech = False
+        self._onset_frames = 0
+        self._segment_samples = 0
+        self._silence_samples = 0
+
+        self.total_samples = 0
+        self.speech_samples = 0
+        self.segments = 0
+
+    def process(self, samples: np.ndarray) -> List[Tuple[np.ndarray, bool]]:
+        """Feed audio; returns speech pieces in order as ``(audio, ends_utterance)``"""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if len(self._remainder):
+            samples = np.concatenate([self._remainder, samples])
+        n_frames = len(samples) // self.frame_size
+        self._remainder = samples[n_frames * self.frame_size:].copy()
+        if n_frames == 0:
+            return []
+
+        frames = samples[:n_frames * self.frame_size].reshape(n_frames, self.frame_size)
+        energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        self.total_samples += n_frames * self.frame_size
+
+        pieces = []
+        current = []
+        for frame, db in zip(frames, energy_db):
+            is_speech = db > max(self.noise_floor_db + self.threshold_db, self.min_energy_db)
+            # Track the background level: follow drops immediately, rises slowly
+            if db < self.noise_floor_db:
+                self.noise_floor_db = db
+            else:
+                rate = 0.002 if is_speech else 0.05
+                self.noise_floor_db += rate * (db - self.noise_floor_db)
+
+            if not self.in_speech:
+                self._pre_roll.append(frame)
+                self._onset_frames = self._onset_frames + 1 if is_speech else 0
+                if self._onset_frames >= self.min_speech_frames:
+                    self.in_speech = True
+                    self._segment_samples = len(self._pre_roll) * self.frame_size
+                    self._silence_samples = 0
+                    current.extend(self._pre_roll)
+                    self._pre_roll.clear()
+                continue
+
+            current.append(frame)
+            self._segment_samples += self.frame_size
+            self._silence_samples = 0 if is_speech else self._silence_samples + self.frame_size
+
+            if self._silence_samples >= self.min_silence_samples:
+                # Natural endpoint
+                pieces.append((np.concatenate(current), True))
+                current = []
+                self.in_speech = False
+                self._onset_frames = 0
+                self.segments += 1
+            elif self._segment_samples >= self.max_segment_samples:
+                # Forced cut; the next frames open a new segment immediately
+                pieces.append((np.concatenate(current), True))
+                current = []
+                self._segment_samples = 0
+                self.segments += 1
+
+        if current:
+            pieces.append((np.concatenate(current), False))
+        self.speech_samples += sum(len(p) for p, _ in pieces)
+        return pieces
+
+    def get_stats(self) -> dict:
+        """Speech ratio and segment counters"""
+        return {
+            "in_speech": self.in_speech,
+            "segments": self.segments,
+            "speech_ratio": self.speech_samples / self.total_samples if self.total_samples else 0.0,
+            "noise_floor_db": round(float(self.noise_floor_db), 1),
+        }
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Test that result-cache hits carry the quality level of the current request (fake model, no GPU)"""
+
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("WHISPER_FAKE_MODEL", "true")
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT_DIR, "backend"), ROOT_DIR]
+
+import numpy as np
+
+from fake_model import FakeWhisperModel
+from quality import QualityController
+from whisper_service import ModelHandle, WhisperService
+
+SAMPLE_RATE = 16000
+
+
+def make_service():
+    service = WhisperService()
+    service.device = "cpu"
+    service.scheduler = None
+    service.quality = QualityController(lambda: 0.0, adaptive=False)
+    model = FakeWhisperModel("tiny", latency_ms=0, rtf=0)
+    handle = ModelHandle(size="tiny", device="cpu", compute_type="int8", cpu_threads=0, num_workers=1,
+                         model=model, batched_model=None, memory_mb=1, load_seconds=0)
+    service.pool.add(handle)
+    return service, handle
+
+
+async def check_cache_hit_label():
+    service, handle = make_service()
+    names = [level.name for level in service.quality.ladder]
+    # "fast" and "minimal" decode identically, so they share cache entries
+    fast, minimal = names.index("fast"), names.index("minimal")
+    assert (service.quality.ladder[fast].decode_options()
+            == service.quality.ladder[minimal].decode_options())
+
+    audio = np.random.default_rng(0).uniform(-0.5, 0.5, 3 * SAMPLE_RATE).astype(np.float32)
+
+    service.quality.index = fast
+    first = await service.transcribe(audio, "en", model=handle.key)
+    assert first and all(not r.get("cached") and r["quality"] == "fast" for r in first), first
+
+    service.quality.index = minimal
+    second = await service.transcribe(audio, "en", model=handle.key)
+    assert second and all(r.get("cached") for r in second), second
+    assert all(r["quality"] == "minimal" for r in second), second
+    assert [r["text"] for r in first] == [r["text"] for r in second]
+    service.shutdown()
+
+
+def test_cache_hit_quality_label():
+    print("\n=== Testing quality label on result-cache hits ===")
+    asyncio.run(check_cache_hit_label())
+    print("✓ Cache hit labelled with the current quality level")
+
+
+if __name__ == "__main__":
+    test_cache_hit_quality_label()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Test POST /transcribe with raw-body and multipart uploads (fake model, no GPU)"""
+
+import io
+import json
+import os
+import sys
+import time
+import wave
+
+# The fake model needs no download; set before the backend is imported
+os.environ.setdefault("WHISPER_FAKE_MODEL", "true")
+os.environ.setdefault("WHISPER_PRELOAD_MODELS", "tiny")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from main import app
+
+SAMPLE_RATE = 16000
+DURATION_S = 3.0
+
+
+def make_wav(seconds: float = DURATION_S) -> bytes:
+    """A 16 kHz mono WAV of tone bursts separated by silence"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = 0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((audio * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def wait_ready(client: TestClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.get("/ready").status_code == 200:
+            return
+        time.sleep(0.2)
+    raise TimeoutError("Server did not become ready")
+
+
+def check_lines(response) -> dict:
+    assert response.status_code == 200, response.text
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert lines, "No output lines"
+    done = lines[-1]
+    assert done["type"] == "done", done
+    assert abs(done["audio_seconds"] - DURATION_S) < 0.1, done
+    assert all(line["type"] == "transcription" for line in lines[:-1])
+    return done
+
+
+def test_raw_body_upload():
+    """The raw body must reach the decoder (it used to be read only after the response started)"""
+    print("\n=== Testing raw-body upload ===")
+    with TestClient(app) as client:
+        wait_ready(client)
+        response = client.post("/transcribe?language=en", content=make_wav(),
+                               headers={"content-type": "audio/wav"}, timeout=30)
+        done = check_lines(response)
+    print(f"✓ Raw body transcribed: {done}")
+
+
+def test_multipart_upload():
+    print("\n=== Testing multipart upload ===")
+    with TestClient(app) as client:
+        wait_ready(client)
+        response = client.post("/transcribe?language=en",
+                               files={"file": ("test.wav", make_wav(), "audio/wav")}, timeout=30)
+        done = check_lines(response)
+    print(f"✓ Multipart upload transcribed: {done}")
+
+
+if __name__ == "__main__":
+    test_raw_body_upload()
+    test_multipart_upload()